@@ -1,3 +1,42 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.http import HttpResponseRedirect
+from django.urls import reverse
 
-# Register your models here.
+from .models import AccountDeletion
+from .purge import request_deletion
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class AccountAdmin(UserAdmin):
+    """UserAdmin whose deletes deactivate the account and queue it for purge_users.
+
+    Django's own delete collects and removes every related row of the user
+    in one transaction; for a user with years of expenses that locks the
+    tables and loads the whole history into memory.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        # Confirm without collecting the users' related rows
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        request_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            request_deletion(user)
+
+    def response_delete(self, request, obj_display, obj_id):
+        self.message_user(request, f'{obj_display} was deactivated and will be deleted by purge_users.', messages.SUCCESS)
+        return HttpResponseRedirect(reverse('admin:auth_user_changelist'))
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'requested_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
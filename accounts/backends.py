@@ -0,0 +1,89 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# Upper bound on cached users per process; the cache is emptied when full
+MAX_CACHED_USERS = 10000
+
+
+class UserCache:
+    """Recently authenticated users for this process, kept for a few seconds.
+
+    Entries are dropped on logout and whenever the user row is saved or
+    deleted in this process. Other processes only see such a change once
+    their entry expires, so AUTH_USER_CACHE_TIMEOUT bounds how long a
+    password change or deactivation takes to log out sessions elsewhere.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires, user = entry
+        if expires < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        # Each request gets its own copy, so per-request state such as
+        # permission caches never leaks between requests
+        return copy.copy(user)
+
+    def set(self, user_id, user, timeout):
+        with self._lock:
+            if len(self._entries) >= MAX_CACHED_USERS:
+                self._entries.clear()
+            self._entries[user_id] = (time.monotonic() + timeout, copy.copy(user))
+
+    def forget(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that serves the per-request user lookup from user_cache."""
+
+    def get_user(self, user_id):
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        user = user_cache.get(user_id) if timeout else None
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None and timeout:
+                user_cache.set(user_id, user, timeout)
+        return user
+
+    async def aget_user(self, user_id):
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        user = user_cache.get(user_id) if timeout else None
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None and timeout:
+                user_cache.set(user_id, user, timeout)
+        return user
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        user_cache.forget(user.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_changed_user(sender, instance, **kwargs):
+    # Covers password changes, deactivation and profile edits
+    user_cache.forget(instance.pk)
@@ -0,0 +1,45 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.purge import BATCH_SIZE, pending_deletions, purge_user
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the accounts queued for deletion and all their data, in short batches '
+        'that never hold long locks. Interrupted runs resume where they stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows deleted per statement.')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to wait between batches.')
+        parser.add_argument('--user', type=int, dest='user_id', help='Only purge this user id.')
+
+    def handle(self, *args, batch_size=BATCH_SIZE, pause=0, user_id=None, verbosity=1, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        if pause < 0:
+            raise CommandError('--pause must not be negative.')
+
+        deletions = pending_deletions()
+        if user_id is not None:
+            deletions = deletions.filter(user_id=user_id)
+
+        started = time.monotonic()
+        purged = 0
+        for deletion in deletions:
+            user = deletion.user
+            totals = Counter()
+            for label, deleted in purge_user(user, batch_size, pause):
+                totals[label] += deleted
+                if verbosity > 1:
+                    self.stdout.write(f'  {user.username}: {totals[label]} {label} deleted')
+            purged += 1
+            if verbosity:
+                summary = ', '.join(f'{count} {label}' for label, count in totals.items() if label != 'user')
+                self.stdout.write(f'Purged {user.username} (id {deletion.user_id}): {summary or "no data"}.')
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} accounts in {elapsed:.1f}s.'))
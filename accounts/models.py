@@ -1,3 +1,14 @@
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+
+class AccountDeletion(models.Model):
+    """A deactivated account waiting for `manage.py purge_users` to delete its data."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='deletion')
+    requested_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['requested_at']
+
+    def __str__(self):
+        return f"{self.user_id} since {self.requested_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import AccountDeletion
+
+BATCH_SIZE = 1000
+
+
+def request_deletion(user):
+    """Deactivate user at once and queue their data for purge_users.
+
+    An inactive user can no longer log in, and their existing sessions stop
+    authenticating, so nothing new is written while the purge runs.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.set_unusable_password()
+        user.save(update_fields=['is_active', 'password'])
+        AccountDeletion.objects.get_or_create(user=user)
+
+
+def delete_in_batches(queryset, batch_size=BATCH_SIZE, pause=0):
+    """Delete queryset's rows with raw DELETE ... WHERE id IN (...) statements; yields each batch's size.
+
+    Each batch is its own short transaction, so locks are held for
+    milliseconds and an interrupted run simply continues from what is left.
+    No instances are built and no signals are sent.
+    """
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    column = connection.ops.quote_name(queryset.model._meta.pk.column)
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({", ".join(["%s"] * len(ids))})', ids)
+        yield len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+def purge_user(user, batch_size=BATCH_SIZE, pause=0):
+    """Delete a user and everything they own, a batch at a time; yields (label, rows deleted).
+
+    Each ACCOUNT_PURGE_STEPS callable takes (user, batch_size, pause) and
+    yields the same pairs while it empties its app's large tables. The
+    user row goes last, cascading to whatever small tables remain.
+    """
+    for path in settings.ACCOUNT_PURGE_STEPS:
+        yield from import_string(path)(user, batch_size, pause)
+    with transaction.atomic():
+        user.delete()
+    yield 'user', 1
+
+
+def pending_deletions():
+    return AccountDeletion.objects.select_related('user')
@@ -1,3 +1,86 @@
-from django.test import TestCase
+import importlib.util
+import os
+import time
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .backends import user_cache
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+
+    def assertLoggedIn(self, logged_in=True):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200 if logged_in else 302)
+
+    def test_requests_reuse_the_cached_user(self):
+        self.assertLoggedIn()
+        self.assertIsNotNone(user_cache.get(self.user.pk))
+        with CaptureQueriesContext(connection) as captured:
+            self.assertLoggedIn()
+        self.assertFalse([query for query in captured if 'auth_user' in query['sql']])
+
+    def test_logout_drops_the_cached_user(self):
+        self.assertLoggedIn()
+        response = self.client.get(reverse('logout'))
+        self.assertRedirects(response, reverse('login'))
+        self.assertIsNone(user_cache.get(self.user.pk))
+        self.assertLoggedIn(False)
+
+    def test_password_change_logs_out_on_the_next_request(self):
+        self.assertLoggedIn()
+        self.user.set_password('new')
+        self.user.save()
+        self.assertLoggedIn(False)
+
+    def test_deactivation_logs_out_on_the_next_request(self):
+        self.assertLoggedIn()
+        self.user.is_active = False
+        self.user.save()
+        self.assertLoggedIn(False)
+
+    def test_changes_made_elsewhere_are_seen_once_the_entry_expires(self):
+        self.assertLoggedIn()
+        # No signal: as when another process deactivates the user
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertLoggedIn()
+        later = time.monotonic() + 31
+        with self.settings(AUTH_USER_CACHE_TIMEOUT=30), patch('accounts.backends.time.monotonic', return_value=later):
+            self.assertLoggedIn(False)
+
+    def test_timeout_zero_disables_the_cache(self):
+        with self.settings(AUTH_USER_CACHE_TIMEOUT=0):
+            self.assertLoggedIn()
+            self.assertIsNone(user_cache.get(self.user.pk))
+
+
+class SessionBackendSettingTests(SimpleTestCase):
+    def load_settings(self, **environ):
+        spec = importlib.util.find_spec('config.settings')
+        module = importlib.util.module_from_spec(spec)
+        with patch.dict(os.environ, environ):
+            spec.loader.exec_module(module)
+        return module
+
+    def test_shared_caches_default_to_cached_db_sessions(self):
+        for backend in ('file', 'redis'):
+            settings = self.load_settings(CACHE_BACKEND=backend)
+            self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.cached_db')
+
+    def test_locmem_defaults_to_db_sessions(self):
+        settings = self.load_settings(CACHE_BACKEND='locmem')
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+
+    def test_session_backend_can_be_chosen(self):
+        settings = self.load_settings(CACHE_BACKEND='file', SESSION_BACKEND='signed_cookies')
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.signed_cookies')
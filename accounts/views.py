@@ -2,7 +2,9 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
 from .forms import UserRegistrationForm
+from .purge import request_deletion
 
 def register(request):
     """Handle user registration."""
@@ -50,3 +52,16 @@ def user_logout(request):
     logout(request)
     messages.success(request, 'You have been logged out successfully.')
     return redirect('login')
+
+@login_required(login_url='login')
+def account_delete(request):
+    """Close the user's account; purge_users deletes its data afterwards."""
+    if request.method == 'POST':
+        if request.user.check_password(request.POST.get('password', '')):
+            request_deletion(request.user)
+            logout(request)
+            messages.success(request, 'Your account has been closed and your data will be deleted shortly.')
+            return redirect('login')
+        messages.error(request, 'Incorrect password.')
+    
+    return render(request, 'accounts/delete.html')
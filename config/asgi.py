@@ -5,6 +5,14 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Long-lived endpoints such as the dashboard stats stream (DASHBOARD_PUSH) are
+async views and should be served through this application rather than WSGI,
+where each open stream would hold a whole worker. With ASYNC_VIEWS=True the
+dashboard, stats and list pages use their async views too. To run it in
+place of the Procfile's sync workers:
+
+    gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker
 """
 
 import os
@@ -0,0 +1,94 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPLICA = 'replica'
+
+# Set after a write; while present the browser's reads stay on the primary
+STICKY_COOKIE = 'db_primary'
+
+# Whether the current request's reads may go to the replica
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def replica_allowed(request):
+    """A safe request from a browser that has not written recently."""
+    return (
+        replica_configured()
+        and request.method in ('GET', 'HEAD')
+        and STICKY_COOKIE not in request.COOKIES
+    )
+
+
+def replica_reads(view):
+    """Send a read-only view's queries to the replica when one is configured.
+
+    Users who wrote within REPLICA_STICKY_SECONDS keep reading from the
+    primary, so they always see their own changes.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(replica_allowed(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(replica_allowed(request))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads inside replica_reads views go to the replica; everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return REPLICA if _replica_reads.get() else 'default'
+
+    def db_for_write(self, model, **hints):
+        # Never follow an instance back to the replica it was read from
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+
+class StickyPrimaryMiddleware:
+    """Mark browsers that just wrote, so replica_reads keeps them on the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.stick(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.stick(request, await self.get_response(request))
+
+    def stick(self, request, response):
+        if replica_configured() and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
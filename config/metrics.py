@@ -0,0 +1,299 @@
+import logging
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('config.metrics.slow')
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# At most this many statements are written for one slow request
+SLOW_LOG_MAX_QUERIES = 50
+
+
+class RequestTimings:
+    """What one request spent on the database and in templates."""
+
+    __slots__ = ('queries', 'db_time', 'template_time', 'sql')
+
+    def __init__(self, keep_sql=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.sql = [] if keep_sql else None
+
+
+_timings = ContextVar('request_timings', default=None)
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'duration', 'queries', 'db_time', 'template_time', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statuses = {}
+
+    def merge(self, other):
+        for i, value in enumerate(list(other.buckets)):
+            self.buckets[i] += value
+        self.count += other.count
+        self.duration += other.duration
+        self.queries += other.queries
+        self.db_time += other.db_time
+        self.template_time += other.template_time
+        for status, value in list(other.statuses.items()):
+            self.statuses[status] = self.statuses.get(status, 0) + value
+
+
+class _ThreadToken:
+    """Kept in a thread's local storage only, so it is collected when the thread ends."""
+
+
+class Registry:
+    """Per-view request metrics for this process.
+
+    Each thread writes only to its own shard, so recording never takes a
+    lock; a scrape sums the shards. A lock is only taken the first time a
+    thread records anything, to register its shard, and when the thread
+    ends, to fold the shard into the retired totals. Servers that start a
+    thread per request therefore keep a bounded number of shards.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            token = self._local.token = _ThreadToken()
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(token, self._retire, shard)
+            return shard
+
+    def _retire(self, shard):
+        # Its thread has ended, so nothing writes to the shard any more
+        with self._shards_lock:
+            self._shards.pop(id(shard), None)
+            for view, stats in shard.items():
+                self._retired.setdefault(view, ViewStats()).merge(stats)
+
+    def observe(self, view, status, duration, timings):
+        shard = self._shard()
+        stats = shard.get(view)
+        if stats is None:
+            stats = shard[view] = ViewStats()
+        stats.buckets[bisect_left(BUCKETS, duration)] += 1
+        stats.count += 1
+        stats.duration += duration
+        stats.queries += timings.queries
+        stats.db_time += timings.db_time
+        stats.template_time += timings.template_time
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def snapshot(self):
+        merged = {}
+        with self._shards_lock:
+            shards = list(self._shards.values())
+            for view, stats in self._retired.items():
+                merged.setdefault(view, ViewStats()).merge(stats)
+        for shard in shards:
+            for view, stats in list(shard.items()):
+                merged.setdefault(view, ViewStats()).merge(stats)
+        return merged
+
+    def render(self):
+        views = sorted(self.snapshot().items())
+        lines = [
+            '# HELP django_http_request_duration_seconds Request latency by view.',
+            '# TYPE django_http_request_duration_seconds histogram',
+        ]
+        for view, stats in views:
+            cumulative = 0
+            for bound, value in zip(BUCKETS + ('+Inf',), stats.buckets):
+                cumulative += value
+                lines.append(f'django_http_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'django_http_request_duration_seconds_sum{{view="{view}"}} {stats.duration:.6f}')
+            lines.append(f'django_http_request_duration_seconds_count{{view="{view}"}} {stats.count}')
+
+        lines += [
+            '# HELP django_http_responses_total Responses by view and status code.',
+            '# TYPE django_http_responses_total counter',
+        ]
+        for view, stats in views:
+            for status, value in sorted(stats.statuses.items()):
+                lines.append(f'django_http_responses_total{{view="{view}",status="{status}"}} {value}')
+
+        for name, attribute, help_text in (
+            ('django_http_db_queries_total', 'queries', 'SQL queries issued, by view.'),
+            ('django_http_db_duration_seconds_total', 'db_time', 'Time spent executing SQL, by view.'),
+            ('django_http_template_duration_seconds_total', 'template_time', 'Time spent rendering templates, by view.'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for view, stats in views:
+                value = getattr(stats, attribute)
+                lines.append(f'{name}{{view="{view}"}} {value if isinstance(value, int) else f"{value:.6f}"}')
+
+        # METRICS_COLLECTORS: dotted paths to callables returning extra lines
+        for path in getattr(settings, 'METRICS_COLLECTORS', []):
+            lines.extend(import_string(path)())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.queries += 1
+        timings.db_time += elapsed
+        if timings.sql is not None:
+            timings.sql.append((elapsed, sql))
+
+
+def instrument(connection):
+    # Installed once per connection and left in place; outside a request it
+    # is a single context variable lookup per query
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrument(connection)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _timings.get()
+        if timings is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render for the metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class MetricsMiddleware:
+    """Record latency, SQL and template time per view into the registry.
+
+    Put it first in MIDDLEWARE so the latency covers the whole stack. For
+    streaming responses only the time to the first byte is measured. Set
+    SLOW_REQUEST_MS to log slower requests together with their SQL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'SLOW_REQUEST_MS', 0) / 1000
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened before this module was imported never sent
+        # connection_created; async views' connections are covered by it.
+        # Only look at this thread's open ones: all() would create a wrapper
+        # for every alias on every request
+        for connection in connections.all(initialized_only=True):
+            if connection.connection is not None:
+                instrument(connection)
+        timings = RequestTimings(keep_sql=bool(self.slow_seconds))
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self.finish(request, response, time.perf_counter() - started, timings)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings(keep_sql=bool(self.slow_seconds))
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self.finish(request, response, time.perf_counter() - started, timings)
+        return response
+
+    def finish(self, request, response, duration, timings):
+        match = request.resolver_match
+        view = label(match.view_name if match else '<unresolved>')
+        registry.observe(view, response.status_code, duration, timings)
+
+        if self.slow_seconds and duration >= self.slow_seconds:
+            slowest = sorted(timings.sql, reverse=True)[:SLOW_LOG_MAX_QUERIES]
+            logger.warning(
+                'Slow request %s %s (%s): %.1fms, %d queries in %.1fms, templates %.1fms\n%s',
+                request.method, request.path, view, duration * 1000, timings.queries,
+                timings.db_time * 1000, timings.template_time * 1000,
+                '\n'.join(f'  {elapsed * 1000:.1f}ms {sql}' for elapsed, sql in slowest),
+            )
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the registry.
+
+    Requires `Authorization: Bearer <METRICS_TOKEN>` when METRICS_TOKEN is
+    set; without a token it is only served in DEBUG.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
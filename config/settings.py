@@ -32,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',
+    'config.db_routers.StickyPrimaryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -46,7 +48,9 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, plus render timing for config.metrics
+        'BACKEND': 'config.metrics.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -65,14 +69,31 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# DATABASE_POOL: use Django's connection pool instead of persistent
+# connections (PostgreSQL with psycopg 3 only: `pip install "psycopg[binary,pool]"`).
+# Each process holds up to DATABASE_POOL_MAX_SIZE connections per database.
+DATABASE_POOL = config('DATABASE_POOL', default=False, cast=bool)
+DATABASE_POOL_MIN_SIZE = config('DATABASE_POOL_MIN_SIZE', default=2, cast=int)
+DATABASE_POOL_MAX_SIZE = config('DATABASE_POOL_MAX_SIZE', default=10, cast=int)
+
+
+def database_from_url(url):
+    if not DATABASE_POOL:
+        return dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+    # The pool replaces persistent connections; Django rejects both at once
+    database = dj_database_url.parse(url, conn_max_age=0)
+    database.setdefault('OPTIONS', {})['pool'] = {
+        'min_size': DATABASE_POOL_MIN_SIZE,
+        'max_size': DATABASE_POOL_MAX_SIZE,
+        'timeout': 10,
+    }
+    return database
+
+
 # Use PostgreSQL if DATABASE_URL is set (Railway), otherwise SQLite (local development)
 if config('DATABASE_URL', default=None):
     DATABASES = {
-        'default': dj_database_url.config(
-            default=config('DATABASE_URL'),
-            conn_max_age=600,
-            conn_health_checks=True,
-        )
+        'default': database_from_url(config('DATABASE_URL')),
     }
 else:
     DATABASES = {
@@ -82,6 +103,83 @@ else:
         }
     }
 
+# Optional read replica. Views wrapped in config.db_routers.replica_reads
+# (dashboard, stats, list, detail, search, export, analytics) read from it,
+# except for a browser that wrote in the last REPLICA_STICKY_SECONDS. Locally
+# a copy of db.sqlite3 can stand in: REPLICA_DATABASE_URL=sqlite:///replica.sqlite3
+REPLICA_DATABASE_URL = config('REPLICA_DATABASE_URL', default='')
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = {
+        **database_from_url(REPLICA_DATABASE_URL),
+        # The suite reads the replica through the default test database;
+        # ReplicaDatabaseTests routes against a separate, never-synced file
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['config.db_routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# locmem (default, per process, LRU-culled at CACHE_MAX_ENTRIES), file, or
+# redis (needs the `redis` package and REDIS_URL)
+
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_TIMEOUT = config('CACHE_TIMEOUT', default=300, cast=int)
+CACHE_MAX_ENTRIES = config('CACHE_MAX_ENTRIES', default=5000, cast=int)
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
+            'TIMEOUT': CACHE_TIMEOUT,
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / '.cache')),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+
+
+# Sessions and authentication
+# SESSION_BACKEND: 'db' (one query per request), 'cached_db' (read from the
+# cache, written through to the database) or 'signed_cookies' (no server-side
+# storage, so logout only clears the browser's cookie). cached_db is the
+# default with a shared cache; with locmem each process would keep its own
+# copy of a session and miss logouts handled by the others.
+
+SESSION_BACKEND = config('SESSION_BACKEND', default='db' if CACHE_BACKEND == 'locmem' else 'cached_db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_BACKEND]
+
+# Seconds each process may reuse the User loaded for a session (0 disables).
+# Logouts and saves in the same process drop the entry immediately; this
+# bounds how long other processes keep a changed user.
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=30, cast=int)
+
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+    # Keeps sessions created before the cached backend was added valid
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -125,8 +223,24 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ] if (BASE_DIR / 'static').exists() else []
 
-# WhiteNoise configuration
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# WhiteNoise configuration. collectstatic writes compressed copies under
+# content-hashed names plus a manifest mapping the source names to them;
+# WhiteNoise serves the hashed names with far-future cache headers. Without a
+# collectstatic run (runserver, tests) set STATIC_MANIFEST=False to serve the
+# plain source names.
+STATIC_MANIFEST = config('STATIC_MANIFEST', default=not DEBUG, cast=bool)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'whitenoise.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
 
 # HTTPS/Security settings for production
 if not DEBUG:
@@ -143,3 +257,52 @@ if not DEBUG:
 CSRF_TRUSTED_ORIGINS = [
     'https://personalexpensetracker.up.railway.app',
 ]
+
+# Dashboard live updates: with DASHBOARD_PUSH the dashboard listens on a
+# Server-Sent Events stream instead of polling (requires an ASGI server)
+DASHBOARD_PUSH = config('DASHBOARD_PUSH', default=False, cast=bool)
+DASHBOARD_PUSH_INTERVAL = config('DASHBOARD_PUSH_INTERVAL', default=3, cast=int)
+DASHBOARD_PUSH_TIMEOUT = config('DASHBOARD_PUSH_TIMEOUT', default=300, cast=int)
+
+# Serve the dashboard, stats and list pages from their async views. Turn on
+# when running under ASGI (see config/asgi.py); under WSGI the sync views
+# avoid a per-request event loop.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Expenses dated before the first of the month this many months ago are
+# moved to the archive table by `manage.py archive_expenses`
+ARCHIVE_AFTER_MONTHS = config('ARCHIVE_AFTER_MONTHS', default=24, cast=int)
+
+# Deleted expenses are reported to delta sync clients for this many days;
+# `manage.py compact_tombstones` drops older tombstones, and sync tokens
+# expire before that so their holders resync in full
+SYNC_TOMBSTONE_DAYS = config('SYNC_TOMBSTONE_DAYS', default=90, cast=int)
+
+# Statements are built by `manage.py run_report_workers` (REPORT_WORKERS
+# processes) and cached under REPORT_CACHE_DIR by data version. A job still
+# running after REPORT_JOB_TIMEOUT seconds is assumed lost and retried.
+REPORT_CACHE_DIR = config('REPORT_CACHE_DIR', default=str(BASE_DIR / '.reports'))
+REPORT_WORKERS = config('REPORT_WORKERS', default=2, cast=int)
+REPORT_JOB_TIMEOUT = config('REPORT_JOB_TIMEOUT', default=600, cast=int)
+
+# Deleted accounts are deactivated at once and emptied later, in short
+# batches, by `manage.py purge_users`; each step purges one app's tables
+ACCOUNT_PURGE_STEPS = ['expenses.purge.purge_user_data']
+
+# Expenses may be recorded in any currency with loaded exchange rates (see
+# `manage.py load_fx_rates`); totals are shown in each user's home currency,
+# which is DEFAULT_CURRENCY until they pick another. Each process keeps the
+# rates it has read for FX_CACHE_SECONDS when converting single rows.
+DEFAULT_CURRENCY = config('DEFAULT_CURRENCY', default='USD')
+FX_CACHE_SECONDS = config('FX_CACHE_SECONDS', default=300, cast=int)
+
+# The admin expense list shows PostgreSQL's planner estimate as its total
+# once it passes 10,000 rows; turn on to always run an exact COUNT(*)
+ADMIN_EXACT_COUNTS = config('ADMIN_EXACT_COUNTS', default=False, cast=bool)
+
+# Request metrics: Prometheus text at /metrics, served only with the bearer
+# METRICS_TOKEN (or in DEBUG). SLOW_REQUEST_MS > 0 logs slower requests
+# with their SQL to the 'config.metrics.slow' logger.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=0, cast=int)
+METRICS_COLLECTORS = ['expenses.caching.metrics_lines']
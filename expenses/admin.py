@@ -1,3 +1,216 @@
-from django.contrib import admin
+import json
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
 
-# Register your models here.
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.paginator import Paginator
+from django.db import connection, connections, models, transaction
+from django.db.models import Min
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import rollups
+from .models import Expense, ExpenseTombstone
+from .versioning import bump_versions, tombstone_written
+
+# Below this many rows an exact COUNT is cheap enough to always run
+EXACT_COUNT_BELOW = 10_000
+# Pages past this are not offered: OFFSET still walks every entry before the
+# page, so the deepest read is bounded at MAX_PAGES * list_per_page entries.
+# Filters and the date hierarchy narrow the list to reach older rows.
+MAX_PAGES = 100
+
+
+def estimated_count(queryset):
+    """The planner's row estimate for queryset on PostgreSQL; None elsewhere."""
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for very large changelists.
+
+    Counts come from planner statistics once they pass EXACT_COUNT_BELOW,
+    unless ADMIN_EXACT_COUNTS is on. A page first reads just its ids from
+    the ordering index, then loads those rows, so deep pages skip over
+    narrow index entries rather than whole joined rows. Only the first
+    MAX_PAGES pages are served.
+    """
+
+    @cached_property
+    def count(self):
+        if not settings.ADMIN_EXACT_COUNTS:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= EXACT_COUNT_BELOW:
+                return estimate
+        return super().count
+
+    @cached_property
+    def num_pages(self):
+        return min(super().num_pages, MAX_PAGES)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        ids = list(self.object_list.values_list('pk', flat=True)[bottom:bottom + self.per_page])
+        return self._get_page(self.object_list.filter(pk__in=ids), number, self)
+
+
+def _next_period(day, kind):
+    if kind == 'year':
+        return day.replace(year=day.year + 1)
+    if kind == 'month':
+        return (day + timedelta(days=32)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+class ExpenseAdminQuerySet(models.QuerySet):
+    def dates(self, field_name, kind, order='ASC'):
+        """Distinct years, months or days, found with one index seek per value.
+
+        The default SELECT DISTINCT truncates every row's date; here each
+        value is the MIN of the dates after the previous one, which the date
+        index answers directly. date_hierarchy lists at most a few dozen.
+        """
+        queryset = self.order_by()
+        found = []
+        day = queryset.aggregate(first=Min(field_name))['first']
+        while day is not None:
+            start = day.replace(month=1, day=1) if kind == 'year' else day.replace(day=1) if kind == 'month' else day
+            found.append(start)
+            day = queryset.filter(**{f'{field_name}__gte': _next_period(start, kind)}).aggregate(
+                first=Min(field_name),
+            )['first']
+        return found[::-1] if order == 'DESC' else found
+
+
+def _mark_changed(queryset):
+    # Marking the rows for delta sync also locks them, so the rollup
+    # deltas read next match exactly what the following statement changes
+    queryset.order_by().update(change_seq=None, updated_at=timezone.now())
+    return queryset.filter(change_seq=None)
+
+
+def recategorize_expenses(queryset, category):
+    """Move the matching expenses to category with set-based statements; returns the number moved.
+
+    Rollups and data versions change as per-row saves would change them.
+    """
+    with transaction.atomic():
+        moving = _mark_changed(queryset.exclude(category=category))
+        removed = rollups.deltas_for_queryset(moving, sign=-1)
+        moved = moving.order_by().update(category=category)
+        added = defaultdict(lambda: [Decimal('0'), 0])
+        for (user_id, year, month, _), (amount, count) in removed.items():
+            added[(user_id, year, month, category)][0] -= amount
+            added[(user_id, year, month, category)][1] -= count
+        rollups.apply_deltas(rollups.merge_deltas(removed, added))
+        bump_versions({key[0] for key in removed})
+    return moved
+
+
+def delete_expenses(queryset):
+    """Delete the matching expenses with set-based statements; returns the number deleted.
+
+    Unlike QuerySet.delete() this never loads the rows to send post_delete;
+    rollups, tombstones and data versions are updated as the signals would.
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        doomed = _mark_changed(queryset)
+        deltas = rollups.deltas_for_queryset(doomed, sign=-1)
+        tombstones, tombstone_params = (
+            doomed.order_by().annotate(deleted_at=models.Value(timezone.now(), output_field=models.DateTimeField()))
+            .values_list('user_id', 'id', 'deleted_at').query.sql_with_params()
+        )
+        ids, id_params = doomed.order_by().values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(ExpenseTombstone._meta.db_table)} (user_id, expense_id, deleted_at) {tombstones}',
+                tombstone_params,
+            )
+            cursor.execute(f'DELETE FROM {quote(Expense._meta.db_table)} WHERE id IN ({ids})', id_params)
+            deleted = cursor.rowcount
+        rollups.apply_deltas(deltas)
+        tombstone_written()
+        bump_versions({key[0] for key in deltas})
+    return deleted
+
+
+@admin.register(Expense)
+class ExpenseAdmin(admin.ModelAdmin):
+    list_display = ('date', 'user', 'category', 'amount', 'currency', 'description')
+    list_filter = ('category',)
+    list_select_related = ('user',)
+    # Served by expense_date_idx, as is the default ordering
+    date_hierarchy = 'date'
+    raw_id_fields = ('user', 'recurring')
+    readonly_fields = ('created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['delete_selected_expenses']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return ExpenseAdminQuerySet(model=queryset.model, query=queryset.query, using=queryset.db)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Django's delete_selected loads, logs and deletes every row one by one
+        actions.pop('delete_selected', None)
+        if self.has_change_permission(request):
+            for code, label in Expense.CATEGORY_CHOICES:
+                name = f'recategorize_{code}'
+                actions[name] = (self._recategorize_action(code, label), name, f'Move selected expenses to {label}')
+        return actions
+
+    def _recategorize_action(self, category, label):
+        def recategorize(modeladmin, request, queryset):
+            moved = recategorize_expenses(queryset, category)
+            self.message_user(request, f'Moved {moved} expenses to {label}.', messages.SUCCESS)
+        return recategorize
+
+    @admin.action(permissions=['delete'], description='Delete selected expenses')
+    def delete_selected_expenses(self, request, queryset):
+        if request.POST.get('post'):
+            deleted = delete_expenses(queryset)
+            self.message_user(request, f'Deleted {deleted} expenses.', messages.SUCCESS)
+            return None
+        # Confirm with a count rather than listing every row like delete_selected
+        return TemplateResponse(request, 'admin/expenses/expense/delete_selected_expenses.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Delete expenses',
+            'opts': self.opts,
+            'count': queryset.count(),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    def save_model(self, request, obj, form, change):
+        # Admin edits keep the rollups in step, as the app's own views do. The
+        # row stays locked until commit, so the old bucket is the one saved last
+        with transaction.atomic():
+            previous = rollups.snapshot(Expense.objects.select_for_update().get(pk=obj.pk)) if change else None
+            super().save_model(request, obj, form, change)
+            if previous:
+                rollups.record_updated(previous, obj)
+            else:
+                rollups.record_created(obj)
+
+    def delete_model(self, request, obj):
+        # Subtract the row as it is now, not as the form loaded it
+        with transaction.atomic():
+            current = Expense.objects.select_for_update().filter(pk=obj.pk).first()
+            if current is not None:
+                rollups.record_deleted(current)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        delete_expenses(queryset)
@@ -0,0 +1,193 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import Count, F, Q, Sum
+
+from . import currency
+from .archive import archived_for, reaches_archive
+from .models import Expense, MonthlyRollup
+from .rows import CATEGORY_LABELS
+
+GRANULARITIES = ('day', 'week', 'month')
+PERCENTILES = (50, 90, 95)
+
+# Longest range a single request may cover, to bound the bucket arrays
+MAX_RANGE_DAYS = 366 * 10
+MAX_WINDOW = 60
+
+CATEGORY_CODES = [code for code, label in Expense.CATEGORY_CHOICES]
+
+
+class AnalyticsError(ValueError):
+    pass
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _full_months(start, end):
+    """First and last month start wholly inside [start, end], or None."""
+    first = start if start.day == 1 else _next_month(start)
+    last = _month_start(end)
+    if _next_month(end) - timedelta(days=1) != end:
+        last = _month_start(last - timedelta(days=1))
+    return (first, last) if first <= last else None
+
+
+def grouped_totals(user, start, end, granularity, home):
+    """(date, category, total, count) rows covering the range, totals in home.
+
+    For monthly reports, whole months come straight from the maintained
+    MonthlyRollup rows, dated to the first of the month, and only the partial
+    months at either end group the raw Expense table by day, converting the
+    amounts in the same query. Bucketing into weeks or months happens
+    afterwards in build_report. The archive is only grouped when the range
+    starts before the archive cutoff.
+    """
+    sources = [Expense.objects.filter(user=user).order_by()]
+    if reaches_archive(start):
+        sources.append(archived_for(user).order_by())
+    months = _full_months(start, end) if granularity == 'month' else None
+    if months is None:
+        return [row for source in sources for row in _daily_totals(source.filter(date__gte=start, date__lte=end), home)]
+
+    first, last = months
+    edges = Q(date__gte=start, date__lt=first) | Q(date__gte=_next_month(last), date__lte=end)
+    monthly = (
+        MonthlyRollup.objects.filter(user=user)
+        .annotate(ordinal=F('year') * 12 + F('month'))
+        .filter(ordinal__gte=first.year * 12 + first.month, ordinal__lte=last.year * 12 + last.month)
+        .values_list('year', 'month', 'category', 'total', 'count')
+    )
+    rows = [(date(year, month, 1), category, total, count) for year, month, category, total, count in monthly]
+    for source in sources:
+        rows.extend(_daily_totals(source.filter(edges), home))
+    return rows
+
+
+def _daily_totals(queryset, home):
+    # Group on the plain date column: truncation functions are per-row
+    # Python callbacks on SQLite, and numpy buckets the days just as well
+    return (
+        queryset.values('date', 'category')
+        .annotate(total=Sum(currency.home_amount(home), default=0), count=Count('id'))
+        .values_list('date', 'category', 'total', 'count')
+    )
+
+
+def _buckets(start, end, granularity):
+    """Every bucket start date in the range, so empty periods report zero."""
+    if granularity == 'month':
+        return np.arange(
+            np.datetime64(start, 'M'), np.datetime64(end, 'M') + 1,
+        ).astype('datetime64[D]')
+    if granularity == 'week':
+        first = start - timedelta(days=start.weekday())
+        return np.arange(np.datetime64(first, 'D'), np.datetime64(end, 'D') + 1, 7)
+    return np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+
+
+def _rolling_mean(series, window):
+    """Trailing mean; the first window-1 points have no full window and are NaN."""
+    if window <= 1 or len(series) < window:
+        return np.full(len(series), np.nan) if window > 1 else series.copy()
+    cumulative = np.cumsum(np.insert(series, 0, 0.0))
+    means = (cumulative[window:] - cumulative[:-window]) / window
+    return np.concatenate([np.full(window - 1, np.nan), means])
+
+
+def _rounded(values):
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def build_report(rows, start, end, granularity, window):
+    """Turn grouped rows into a category breakdown and a time series.
+
+    Rows are scattered into a (period x category) matrix once; every other
+    figure is a vectorized reduction over that matrix.
+    """
+    buckets = _buckets(start, end, granularity)
+    totals = np.zeros((len(buckets), len(CATEGORY_CODES)))
+    counts = np.zeros((len(buckets), len(CATEGORY_CODES)), dtype=np.int64)
+
+    if rows:
+        days, categories, amounts, row_counts = zip(*rows)
+        # Each day lands in the last bucket starting on or before it
+        period_index = np.searchsorted(buckets, np.array(days, dtype='datetime64[D]'), side='right') - 1
+        category_index = np.array([CATEGORY_CODES.index(code) if code in CATEGORY_CODES else -1 for code in categories])
+        known = category_index >= 0
+        np.add.at(totals, (period_index[known], category_index[known]), np.array(amounts, dtype=float)[known])
+        np.add.at(counts, (period_index[known], category_index[known]), np.array(row_counts, dtype=np.int64)[known])
+
+    series = totals.sum(axis=1)
+    category_totals = totals.sum(axis=0)
+    category_counts = counts.sum(axis=0)
+    grand_total = category_totals.sum()
+    shares = category_totals / grand_total if grand_total else np.zeros_like(category_totals)
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'total': round(float(grand_total), 2),
+        'count': int(category_counts.sum()),
+        'categories': [
+            {
+                'category': CATEGORY_LABELS[code],
+                'category_code': code,
+                'total': round(float(category_totals[i]), 2),
+                'count': int(category_counts[i]),
+                'share': round(float(shares[i]), 4),
+            }
+            for i, code in enumerate(CATEGORY_CODES)
+        ],
+        'series': {
+            'periods': [str(bucket) for bucket in buckets],
+            'totals': _rounded(series),
+            'rolling_average': _rounded(_rolling_mean(series, window)),
+            'rolling_window': window,
+            'by_category': {code: _rounded(totals[:, i]) for i, code in enumerate(CATEGORY_CODES)},
+        },
+        'percentiles': {
+            f'p{p}': round(float(value), 2)
+            for p, value in zip(PERCENTILES, np.percentile(series, PERCENTILES) if len(series) else [0] * len(PERCENTILES))
+        },
+    }
+
+
+def parse_range(params, today):
+    """Validate start/end/granularity/window query parameters."""
+    try:
+        end = date.fromisoformat(params['end']) if params.get('end') else today
+        start = date.fromisoformat(params['start']) if params.get('start') else _next_month(date(end.year - 1, end.month, 1))
+    except ValueError:
+        raise AnalyticsError('Dates must be in YYYY-MM-DD format.')
+    if start > end:
+        raise AnalyticsError('start must not be after end.')
+    if (end - start).days > MAX_RANGE_DAYS:
+        raise AnalyticsError(f'Ranges are limited to {MAX_RANGE_DAYS} days.')
+
+    granularity = params.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        raise AnalyticsError(f'granularity must be one of: {", ".join(GRANULARITIES)}.')
+
+    try:
+        window = int(params.get('window', 3))
+    except ValueError:
+        raise AnalyticsError('window must be an integer.')
+    if not 1 <= window <= MAX_WINDOW:
+        raise AnalyticsError(f'window must be between 1 and {MAX_WINDOW}.')
+
+    return start, end, granularity, window
+
+
+def spending_report(user, start, end, granularity, window):
+    # The rollups are kept in the home currency, so the raw rows are converted to it too
+    home = currency.home_currency(user.pk)
+    rows = grouped_totals(user, start, end, granularity, home)
+    return {**build_report(rows, start, end, granularity, window), 'currency': home}
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedExpense, Expense
+from .versioning import bump_versions
+
+# Columns copied between the hot table and the archive
+ARCHIVE_COLUMNS = (
+    'id', 'user_id', 'amount', 'currency', 'category', 'description', 'date', 'created_at', 'updated_at', 'change_seq',
+    'recurring_id',
+)
+
+BATCH_SIZE = 1000
+
+
+def archive_cutoff(today=None):
+    """First day of the month ARCHIVE_AFTER_MONTHS before today's month.
+
+    Every archived row is dated before the cutoff. It only moves forward
+    while the setting is unchanged, so reads can rely on it without asking
+    the database; after raising the setting, run archive_expenses to bring
+    the newer rows back.
+    """
+    today = today or timezone.now().date()
+    year, month = divmod(today.year * 12 + today.month - 1 - settings.ARCHIVE_AFTER_MONTHS, 12)
+    return today.replace(year=year, month=month + 1, day=1)
+
+
+def reaches_archive(start, today=None):
+    """Whether a read from start (None: no lower bound) may need archived rows."""
+    return start is None or start < archive_cutoff(today)
+
+
+def archived_for(user):
+    return ArchivedExpense.objects.filter(user=user)
+
+
+def _move(queryset, target, batch_size):
+    """Move queryset's rows into target's table in batches; returns the number moved.
+
+    Rows are copied with INSERT ... SELECT, so they keep their ids,
+    timestamps and change_seq, and no model instances are built; a move is
+    not a change as far as delta sync is concerned. Each batch is its own
+    transaction and bumps its owners' data versions once; the rollups
+    count hot and archived rows alike, so they do not change.
+    """
+    source = connection.ops.quote_name(queryset.model._meta.db_table)
+    target = connection.ops.quote_name(target._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(column) for column in ARCHIVE_COLUMNS)
+    moved, last_id = 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                queryset.select_for_update().filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'user_id')[:batch_size]
+            )
+            if not batch:
+                return moved
+            ids = [pk for pk, user_id in batch]
+            placeholders = ', '.join(['%s'] * len(ids))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {target} ({columns}) SELECT {columns} FROM {source} WHERE id IN ({placeholders})', ids,
+                )
+                # Raw SQL sends no signals; on SQLite the FTS triggers still fire
+                cursor.execute(f'DELETE FROM {source} WHERE id IN ({placeholders})', ids)
+            bump_versions({user_id for pk, user_id in batch})
+        moved += len(batch)
+        # Walking the primary key reads the source table once over the whole run
+        last_id = ids[-1]
+
+
+def archive_before(cutoff, batch_size=BATCH_SIZE):
+    """Move expenses dated before cutoff into the archive."""
+    return _move(Expense.objects.filter(date__lt=cutoff), ArchivedExpense, batch_size)
+
+
+def restore_since(cutoff, batch_size=BATCH_SIZE):
+    """Move archived expenses dated on or after cutoff back to the Expense table."""
+    return _move(ArchivedExpense.objects.filter(date__gte=cutoff), Expense, batch_size)
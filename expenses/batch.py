@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .currency import home_currency
+from .forms import ExpenseForm, posted_values
+from .models import Expense
+from .versioning import batched_bumps, note_change
+
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+MAX_BATCH_OPERATIONS = 500
+
+EDITABLE_FIELDS = list(ExpenseForm._meta.fields)
+SYNC_FIELDS = ['updated_at', 'change_seq']
+
+
+class BatchError(ValueError):
+    pass
+
+
+class Operation:
+    def __init__(self, op, expense_id=None, data=None):
+        self.op = op
+        self.expense_id = expense_id
+        self.data = data or {}
+        self.expense = None
+        self.previous = None
+        self.errors = None
+
+
+def parse_operations(payload):
+    """Turn the decoded request body into Operations, rejecting malformed input."""
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('Expected a non-empty "operations" list.')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchError(f'At most {MAX_BATCH_OPERATIONS} operations are allowed per batch.')
+
+    parsed = []
+    for item in operations:
+        if not isinstance(item, dict) or item.get('op') not in BATCH_OPERATIONS:
+            raise BatchError(f'Each operation needs an "op" of {", ".join(BATCH_OPERATIONS)}.')
+        data = item.get('data')
+        if data is not None and not isinstance(data, dict):
+            raise BatchError('Operation "data" must be an object.')
+        expense_id = item.get('id')
+        # JSON true and false decode to bools, which isinstance() counts as ints
+        if item['op'] != 'create' and type(expense_id) is not int:
+            raise BatchError(f'"{item["op"]}" operations need an integer "id".')
+        parsed.append(Operation(item['op'], expense_id, data))
+    return parsed
+
+
+def _validate(user, operations, expenses):
+    home = home_currency(user.pk)
+    seen = set()
+    for operation in operations:
+        if operation.op != 'create':
+            expense = expenses.get(operation.expense_id)
+            if expense is None:
+                operation.errors = {'id': ['Expense not found.']}
+                continue
+            if operation.expense_id in seen:
+                operation.errors = {'id': ['Expense appears in more than one operation.']}
+                continue
+            seen.add(operation.expense_id)
+            operation.expense = expense
+
+        if operation.op == 'delete':
+            continue
+
+        data, errors = posted_values(operation.data)
+        if errors:
+            operation.errors = errors
+            continue
+        if operation.op == 'update':
+            operation.previous = rollups.snapshot(operation.expense)
+        form = ExpenseForm(data, instance=operation.expense, home=home)
+        if form.is_valid():
+            operation.expense = form.save(commit=False)
+            operation.expense.user = user
+        else:
+            operation.errors = {field: [str(error) for error in errors] for field, errors in form.errors.items()}
+
+
+def apply_operations(user, operations):
+    """Validate every operation, then apply all of them or none.
+
+    Returns True when the batch was applied. Either way each Operation carries
+    its expense or its errors for the response.
+    """
+    with transaction.atomic(), batched_bumps():
+        ids = [operation.expense_id for operation in operations if operation.op != 'create']
+        expenses = Expense.objects.select_for_update().filter(user=user).in_bulk(ids) if ids else {}
+        _validate(user, operations, expenses)
+        if any(operation.errors for operation in operations):
+            return False
+
+        created = [operation.expense for operation in operations if operation.op == 'create']
+        updated = [operation for operation in operations if operation.op == 'update']
+        deleted = [operation.expense for operation in operations if operation.op == 'delete']
+
+        Expense.objects.bulk_create(created)
+        # bulk_update skips Expense.save(), so mark the rows changed here
+        now = timezone.now()
+        for operation in updated:
+            operation.expense.updated_at, operation.expense.change_seq = now, None
+        Expense.objects.bulk_update([operation.expense for operation in updated], EDITABLE_FIELDS + SYNC_FIELDS)
+        if deleted:
+            Expense.objects.filter(user=user, id__in=[expense.id for expense in deleted]).delete()
+
+        rollups.apply_deltas(rollups.merge_deltas(
+            rollups.deltas_for(created),
+            rollups.deltas_for([operation.previous for operation in updated], sign=-1),
+            rollups.deltas_for([operation.expense for operation in updated]),
+            rollups.deltas_for(deleted, sign=-1),
+        ))
+        # bulk_create and bulk_update send no signals
+        if created or updated:
+            note_change(user.pk)
+    return True
@@ -0,0 +1,110 @@
+import time
+
+import numpy as np
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import rollups
+from .models import Expense
+
+ITERATIONS = 50
+WARMUP = 1
+PERCENTILES = (50, 95, 99)
+
+# A view regresses when its p95 grows by more than this fraction over the
+# baseline, or when it issues more queries than the baseline recorded.
+# Millisecond-scale views jitter, so small absolute changes are tolerated.
+LATENCY_THRESHOLD = 0.25
+LATENCY_SLACK_MS = 2.0
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def _new_expense(user):
+    return (), {
+        'amount': '12.50',
+        'category': 'food',
+        'description': 'Benchmark lunch',
+        'date': timezone.now().date().isoformat(),
+    }
+
+
+def _disposable_expense(user):
+    with transaction.atomic():
+        expense = Expense.objects.create(
+            user=user, amount='3.00', category='other', date=timezone.now().date(),
+        )
+        rollups.record_created(expense)
+    return (expense.pk,), {}
+
+
+class Benchmark:
+    """One view request, optionally prepared per iteration outside the timing."""
+
+    def __init__(self, name, url_name, method='get', params=None, prepare=None):
+        self.name = name
+        self.url_name = url_name
+        self.method = method
+        self.params = params or {}
+        self.prepare = prepare
+
+    def request(self, client, user):
+        args, data = self.prepare(user) if self.prepare else ((), {})
+        url = reverse(self.url_name, args=args)
+        if self.method == 'post':
+            return lambda: client.post(url, data, headers={'X-Requested-With': 'XMLHttpRequest'})
+        return lambda: client.get(url, self.params)
+
+
+BENCHMARKS = [
+    Benchmark('dashboard', 'dashboard'),
+    Benchmark('dashboard_stats', 'dashboard_stats'),
+    Benchmark('expense_list', 'expense_list'),
+    Benchmark('expense_list_filtered', 'expense_list', params={'category': 'food', 'search': 'Lunch'}),
+    Benchmark('expense_create', 'expense_create', method='post', prepare=_new_expense),
+    Benchmark('expense_delete', 'expense_delete', method='post', prepare=_disposable_expense),
+]
+
+
+def run_benchmark(benchmark, client, user, iterations=ITERATIONS, warmup=WARMUP):
+    """Time iterations requests; returns latency percentiles (ms) and the query count."""
+    samples, queries = [], []
+    for n in range(warmup + iterations):
+        send = benchmark.request(client, user)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = send()
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise BenchmarkError(f'{benchmark.name} answered {response.status_code}.')
+        if n >= warmup:
+            samples.append(elapsed * 1000)
+            queries.append(len(captured))
+
+    result = {f'p{p}_ms': round(float(value), 3) for p, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES))}
+    result['mean_ms'] = round(float(np.mean(samples)), 3)
+    result['queries'] = max(queries)
+    return result
+
+
+def run_benchmarks(client, user, iterations=ITERATIONS, benchmarks=BENCHMARKS):
+    return {benchmark.name: run_benchmark(benchmark, client, user, iterations) for benchmark in benchmarks}
+
+
+def find_regressions(results, baseline, threshold=LATENCY_THRESHOLD):
+    """Compare results with a baseline's 'views' section; returns readable problems."""
+    problems = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['queries'] > previous['queries']:
+            problems.append(f'{name}: {result["queries"]} queries, baseline {previous["queries"]}')
+        limit = max(previous['p95_ms'] * (1 + threshold), previous['p95_ms'] + LATENCY_SLACK_MS)
+        if result['p95_ms'] > limit:
+            problems.append(f'{name}: p95 {result["p95_ms"]:.1f}ms, baseline {previous["p95_ms"]:.1f}ms (limit {limit:.1f}ms)')
+    return problems
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .currency import home_currency, money
+from .models import Budget, MonthlyRollup
+from .rollups import CENTS
+
+
+def _spent(year, month):
+    """The maintained rollup total for the outer budget's user and category."""
+    return Coalesce(
+        Subquery(
+            MonthlyRollup.objects.filter(
+                user_id=OuterRef('user_id'), category=OuterRef('category'), year=year, month=month,
+            ).values('total')[:1]
+        ),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def budget_status(user, today):
+    """Each of the user's budgets with this month's spending, in one query."""
+    budgets = Budget.objects.filter(user=user).annotate(spent=_spent(today.year, today.month))
+    return [
+        {
+            'category': budget.category,
+            'category_label': budget.get_category_display(),
+            'budget': f'{budget.amount:.2f}',
+            'spent': f'{Decimal(budget.spent).quantize(CENTS):.2f}',
+            'over': budget.spent > budget.amount,
+        }
+        for budget in budgets
+    ]
+
+
+def over_budget(expense):
+    """Warnings for the month and category an expense was just written to.
+
+    Call after the rollups are updated. The check is a single read of the
+    budget row with its rollup total beside it, never a sum over expenses;
+    moving an expense out of a bucket can only lower that bucket's spending,
+    so only the bucket it now sits in is checked.
+    """
+    budget = (
+        Budget.objects.filter(user_id=expense.user_id, category=expense.category)
+        .annotate(spent=_spent(expense.date.year, expense.date.month))
+        .first()
+    )
+    if budget is None or budget.spent <= budget.amount:
+        return []
+    spent = Decimal(budget.spent).quantize(CENTS)
+    label = budget.get_category_display()
+    home = home_currency(expense.user_id)
+    return [{
+        'category': budget.category,
+        'month': f'{expense.date:%Y-%m}',
+        'budget': f'{budget.amount:.2f}',
+        'spent': f'{spent:.2f}',
+        'message': (
+            f'{label} spending for {expense.date:%B %Y} is {money(spent, home)}, '
+            f'over the {money(budget.amount, home)} budget.'
+        ),
+    }]
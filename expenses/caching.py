@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.dispatch import receiver
+
+from .models import DataVersion
+from .versioning import aget_version, get_version, version_bumped
+
+KEY_PREFIX = 'expenses'
+
+# How long a cached data version may be trusted before re-reading it from the
+# database. Bumps delete it on commit; this only bounds cross-process races.
+VERSION_TIMEOUT = 30
+
+_MISSING = object()
+
+
+class CacheStats:
+    """Per-name hit/miss counters for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def record(self, name, hit):
+        with self._lock:
+            (self.hits if hit else self.misses)[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {'hits': self.hits[name], 'misses': self.misses[name]}
+                for name in sorted(self.hits.keys() | self.misses.keys())
+            }
+
+
+stats = CacheStats()
+
+
+def metrics_lines():
+    """Cache hit/miss counters in Prometheus text format (see METRICS_COLLECTORS)."""
+    lines = [
+        '# HELP expenses_cache_requests_total Versioned cache lookups by entry name and result.',
+        '# TYPE expenses_cache_requests_total counter',
+    ]
+    for name, counts in stats.snapshot().items():
+        lines.append(f'expenses_cache_requests_total{{name="{name}",result="hit"}} {counts["hits"]}')
+        lines.append(f'expenses_cache_requests_total{{name="{name}",result="miss"}} {counts["misses"]}')
+    return lines
+
+
+def _prefix(alias=None):
+    # Reads routed to a replica (see config.db_routers) cache apart from the
+    # primary's: the replica may lag, and a user who just wrote must not be
+    # served what it built from before their write
+    alias = alias or router.db_for_read(DataVersion)
+    return KEY_PREFIX if alias == 'default' else f'{KEY_PREFIX}@{alias}'
+
+
+def _version_key(user_id, alias=None):
+    return f'{_prefix(alias)}:version:{user_id}'
+
+
+def data_version(user_id):
+    """The user's data version, read through the cache."""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = get_version(user_id)
+        cache.set(_version_key(user_id), version, VERSION_TIMEOUT)
+    return version
+
+
+async def adata_version(user_id):
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        version = await aget_version(user_id)
+        await cache.aset(_version_key(user_id), version, VERSION_TIMEOUT)
+    return version
+
+
+def versioned_key(user_id, name, *parts, version=None):
+    if version is None:
+        version = data_version(user_id)
+    key = f'{_prefix()}:{user_id}:{version}:{name}'
+    if parts:
+        # Parts may hold free text such as search queries; keep keys short and safe
+        key += ':' + hashlib.md5(repr(parts).encode()).hexdigest()
+    return key
+
+
+def cached(user_id, name, builder, *parts, timeout=None):
+    """Return builder() cached under the user's current data version.
+
+    A write bumps the version, so older entries are never read again and
+    simply age out of the cache.
+    """
+    key = versioned_key(user_id, name, *parts)
+    value = cache.get(key, _MISSING)
+    stats.record(name, value is not _MISSING)
+    if value is _MISSING:
+        value = builder()
+        cache.set(key, value, settings.CACHE_TIMEOUT if timeout is None else timeout)
+    return value
+
+
+async def acached(user_id, name, builder, *parts, timeout=None, version=None):
+    """Async cached(); builder returns an awaitable. Shares entries with cached()."""
+    if version is None:
+        version = await adata_version(user_id)
+    key = versioned_key(user_id, name, *parts, version=version)
+    value = await cache.aget(key, _MISSING)
+    stats.record(name, value is not _MISSING)
+    if value is _MISSING:
+        value = await builder()
+        await cache.aset(key, value, settings.CACHE_TIMEOUT if timeout is None else timeout)
+    return value
+
+
+@receiver(version_bumped)
+def forget_version(sender, user_id, **kwargs):
+    # Drop the cached version now, and again once the write is visible to
+    # other connections in case one of them re-cached the old value meanwhile
+    keys = [_version_key(user_id, alias) for alias in settings.DATABASES]
+    cache.delete_many(keys)
+    transaction.on_commit(partial(cache.delete_many, keys))
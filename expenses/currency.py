@@ -0,0 +1,236 @@
+import bisect
+import csv
+import re
+import threading
+import time
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Round
+
+from .caching import KEY_PREFIX
+from .models import FxRate, HomeCurrency
+
+CENTS = Decimal('0.01')
+CODE = re.compile(r'^[A-Z]{3}$')
+
+# How long a user's home currency is cached; changing it deletes the entry
+HOME_TIMEOUT = 60 * 60
+
+CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥', 'INR': '₹'}
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def money(amount, currency):
+    """amount formatted for display, e.g. '$12.50' or 'CHF 12.50'."""
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    return f'{symbol}{amount:,.2f}' if symbol else f'{currency} {amount:,.2f}'
+
+
+def read_rates(stream, base):
+    """FxRate rows from a CSV stream with date, currency and rate columns.
+
+    Each rate is the units of currency one unit of base buys; base itself
+    gets a rate of 1 on every day listed. Raises ValueError naming the
+    first bad line.
+    """
+    rates = {}
+    reader = csv.DictReader(stream)
+    for row in reader:
+        try:
+            day = date.fromisoformat(row['date'].strip())
+            code = row['currency'].strip().upper()
+            rate = Decimal(row['rate'].strip())
+        except (KeyError, AttributeError, ValueError, InvalidOperation):
+            raise ValueError(f'line {reader.line_num}: expected a YYYY-MM-DD date, a currency code and a rate')
+        if not CODE.match(code) or not rate > 0:
+            raise ValueError(f'line {reader.line_num}: {code!r} is not a currency code or {rate} is not a positive rate')
+        rates[code, day] = FxRate(currency=code, date=day, rate=rate)
+        rates.setdefault((base, day), FxRate(currency=base, date=day, rate=Decimal('1')))
+    return list(rates.values())
+
+
+# Home currencies
+
+def _home_key(user_id, alias=None):
+    # Per database like the data versions, so a lagging replica's answer
+    # never reaches the writes that price rollups
+    alias = alias or router.db_for_read(HomeCurrency)
+    return f'{KEY_PREFIX}:home:{alias}:{user_id}'
+
+
+def home_currencies(user_ids):
+    """{user id: home currency} for user_ids, read through the cache."""
+    keys = {user_id: _home_key(user_id) for user_id in user_ids}
+    found = cache.get_many(keys.values())
+    homes = {user_id: found[key] for user_id, key in keys.items() if key in found}
+    missing = [user_id for user_id in keys if user_id not in homes]
+    if missing:
+        chosen = dict(HomeCurrency.objects.filter(user_id__in=missing).values_list('user_id', 'currency'))
+        loaded = {user_id: chosen.get(user_id, settings.DEFAULT_CURRENCY) for user_id in missing}
+        cache.set_many({keys[user_id]: home for user_id, home in loaded.items()}, HOME_TIMEOUT)
+        homes.update(loaded)
+    return homes
+
+
+def home_currency(user_id):
+    return home_currencies([user_id])[user_id]
+
+
+async def ahome_currency(user_id):
+    key = _home_key(user_id)
+    home = await cache.aget(key)
+    if home is None:
+        home = await HomeCurrency.objects.filter(user_id=user_id).values_list('currency', flat=True).afirst()
+        home = home or settings.DEFAULT_CURRENCY
+        await cache.aset(key, home, HOME_TIMEOUT)
+    return home
+
+
+def forget_home_currency(user_id):
+    cache.delete_many([_home_key(user_id, alias) for alias in settings.DATABASES])
+
+
+# Conversion in the database
+
+def _rate_on(currency):
+    """The latest rate for currency on or before the outer row's date: one index seek."""
+    return Subquery(
+        FxRate.objects.filter(currency=currency, date__lte=OuterRef('date')).order_by('-date').values('rate')[:1]
+    )
+
+
+def home_amount(home=None):
+    """Expression for an expense row's amount in home, or else in its owner's home currency.
+
+    Rows already in that currency pass straight through, so a sum over a
+    mostly single-currency table costs about what Sum('amount') does; the
+    rest are priced from FxRate inside the query. A row with no rate on or
+    before its date converts to NULL, which sums ignore.
+    """
+    if home is None:
+        home = Coalesce(F('user__home_currency__currency'), Value(settings.DEFAULT_CURRENCY))
+        rate_home = Coalesce(OuterRef('user__home_currency__currency'), Value(settings.DEFAULT_CURRENCY))
+    else:
+        home = rate_home = Value(home)
+    return Case(
+        When(currency=home, then=F('amount')),
+        default=Round(F('amount') * _rate_on(rate_home) / _rate_on(OuterRef('currency')), 2),
+        output_field=MONEY,
+    )
+
+
+# Conversion in Python
+
+class Rates:
+    """Rate histories by currency, answering "the latest rate on or before a day"."""
+
+    def __init__(self, rows=()):
+        # rows are (currency, date, rate), ordered by currency and date
+        self.history = {}
+        for currency, day, rate in rows:
+            days, values = self.history.setdefault(currency, ([], []))
+            days.append(day)
+            values.append(rate)
+
+    def rate(self, currency, day):
+        days, values = self.history.get(currency, ((), ()))
+        position = bisect.bisect_right(days, day)
+        return values[position - 1] if position else None
+
+    def convert(self, amount, currency, home, day):
+        """amount in home, rounded like home_amount(); None without both rates."""
+        if currency == home:
+            return Decimal(amount)
+        source, target = self.rate(currency, day), self.rate(home, day)
+        if source is None or target is None:
+            return None
+        return (Decimal(amount) * target / source).quantize(CENTS, ROUND_HALF_UP)
+
+
+def rates_for(conversions):
+    """Rates fresh from the database for (currency, home, day) conversions, in one query.
+
+    Only the days spanned are read, plus the last rate before the earliest.
+    Rollup deltas are priced with these, never with the process cache, so
+    they match what home_amount() computes for the same rows.
+    """
+    spans = {}
+    for currency, home, day in conversions:
+        if currency == home:
+            continue
+        for code in (currency, home):
+            first, last = spans.get(code, (day, day))
+            spans[code] = (min(first, day), max(last, day))
+    if not spans:
+        return Rates()
+    windows = []
+    for code, (first, last) in spans.items():
+        floor = FxRate.objects.filter(currency=code, date__lte=first).order_by('-date').values('date')[:1]
+        windows.append(Q(currency=code, date__lte=last, date__gte=Coalesce(Subquery(floor), Value(first))))
+    return Rates(
+        FxRate.objects.filter(reduce(or_, windows)).order_by('currency', 'date').values_list('currency', 'date', 'rate')
+    )
+
+
+class RateCache:
+    """Each currency's full rate history, read once per process and again every FX_CACHE_SECONDS.
+
+    For display: converting the rows of a page costs no queries once the
+    currencies involved are loaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates = Rates()
+        self._loaded = {}
+        self._currencies = None
+
+    def clear(self):
+        with self._lock:
+            self._rates = Rates()
+            self._loaded = {}
+            self._currencies = None
+
+    def _fresh(self, loaded_at):
+        return loaded_at is not None and time.monotonic() - loaded_at < settings.FX_CACHE_SECONDS
+
+    def _load(self, *currencies):
+        stale = [code for code in set(currencies) if not self._fresh(self._loaded.get(code))]
+        if not stale:
+            return
+        loaded = Rates(
+            FxRate.objects.filter(currency__in=stale).order_by('currency', 'date').values_list('currency', 'date', 'rate')
+        )
+        with self._lock:
+            history = dict(self._rates.history)
+            for code in stale:
+                history[code] = loaded.history.get(code, ([], []))
+                self._loaded[code] = time.monotonic()
+            rates = Rates()
+            rates.history = history
+            self._rates = rates
+
+    def convert(self, amount, currency, home, day):
+        if currency == home:
+            return Decimal(amount)
+        self._load(currency, home)
+        return self._rates.convert(amount, currency, home, day)
+
+    def currencies(self):
+        """Every currency with loaded rates, plus DEFAULT_CURRENCY."""
+        loaded_at, codes = self._currencies or (None, None)
+        if not self._fresh(loaded_at):
+            codes = {settings.DEFAULT_CURRENCY, *FxRate.objects.values_list('currency', flat=True).distinct()}
+            self._currencies = (time.monotonic(), codes)
+        return codes
+
+
+rate_cache = RateCache()
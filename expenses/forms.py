@@ -1,10 +1,61 @@
 from django import forms
-from .models import Expense
+from django.conf import settings
+
+from .currency import rate_cache
+from .models import Budget, Expense, RecurringExpense, ReportJob
+
+
+def posted_values(values):
+    """Decoded JSON values as a form would receive them in a POST; returns (data, errors).
+
+    Form fields only clean strings, so numbers become strings and any other
+    value but None (lists, objects, booleans) is an error for its field.
+    """
+    data, errors = {}, {}
+    for name, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif value is not None and not isinstance(value, str):
+            errors[name] = ['Enter a text or number value.']
+            continue
+        data[name] = value
+    return data, errors
+
+
+class CurrencyField(forms.CharField):
+    """An ISO 4217 code with loaded exchange rates, or blank."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('widget', forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. EUR'}))
+        super().__init__(max_length=3, **kwargs)
+
+    def clean(self, value):
+        value = super().clean(value).upper()
+        if value and value not in rate_cache.currencies():
+            raise forms.ValidationError(f'No exchange rates are loaded for {value}.')
+        return value
+
+
+class CurrencyMixin:
+    """A blank currency keeps the instance's, or takes the owner's home currency when new."""
+
+    def __init__(self, *args, home=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.home = home or settings.DEFAULT_CURRENCY
+        if self.instance.pk is None:
+            self.fields['currency'].initial = self.home
+
+    def clean_currency(self):
+        return self.cleaned_data['currency'] or (self.instance.currency if self.instance.pk else self.home)
+
+
+class ExpenseForm(CurrencyMixin, forms.ModelForm):
+    currency = CurrencyField()
 
-class ExpenseForm(forms.ModelForm):
     class Meta:
         model = Expense
-        fields = ['amount', 'category', 'description', 'date']
+        fields = ['amount', 'currency', 'category', 'description', 'date']
         widgets = {
             'amount': forms.NumberInput(attrs={
                 'class': 'form-control',
@@ -25,3 +76,53 @@ class ExpenseForm(forms.ModelForm):
                 'type': 'date',
             }),
         }
+
+
+class BudgetForm(forms.ModelForm):
+    class Meta:
+        model = Budget
+        fields = ['category', 'amount']
+
+    def clean_amount(self):
+        amount = self.cleaned_data['amount']
+        if amount < 0:
+            raise forms.ValidationError('A budget cannot be negative.')
+        return amount
+
+
+class RecurringExpenseForm(CurrencyMixin, forms.ModelForm):
+    currency = CurrencyField()
+
+    class Meta:
+        model = RecurringExpense
+        fields = ['amount', 'currency', 'category', 'description', 'frequency', 'interval', 'by_weekday', 'start_date', 'end_date']
+
+    def clean_by_weekday(self):
+        # Accepts RRULE's BYDAY spelling, e.g. "MO,WE,FR", in any case or order
+        codes = {code.strip().upper() for code in self.cleaned_data['by_weekday'].split(',') if code.strip()}
+        unknown = codes.difference(RecurringExpense.WEEKDAY_CODES)
+        if unknown:
+            raise forms.ValidationError(f"Unknown weekday {sorted(unknown)[0]}; use {', '.join(RecurringExpense.WEEKDAY_CODES)}.")
+        return ','.join(code for code in RecurringExpense.WEEKDAY_CODES if code in codes)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('interval') == 0:
+            self.add_error('interval', 'Repeat at least every 1 period.')
+        if cleaned_data.get('by_weekday') and cleaned_data.get('frequency') != RecurringExpense.WEEKLY:
+            self.add_error('by_weekday', 'Weekdays apply to weekly rules only.')
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', 'The end date must not be before the start date.')
+        return cleaned_data
+
+
+class HomeCurrencyForm(forms.Form):
+    currency = CurrencyField(required=True)
+
+
+class ReportForm(forms.Form):
+    period = forms.ChoiceField(choices=ReportJob.PERIOD_CHOICES)
+    # Any day in the period; a month input sends YYYY-MM
+    date = forms.DateField(input_formats=['%Y-%m-%d', '%Y-%m', '%Y'])
+    format = forms.ChoiceField(choices=ReportJob.FORMAT_CHOICES)
@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import rollups
+from .currency import home_currency
+from .forms import ExpenseForm, posted_values
+from .models import Expense
+from .versioning import bump_version
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+BATCH_SIZE = 1000
+
+# Keep memory flat on badly broken files: count every error, report the first few
+MAX_REPORTED_ERRORS = 100
+
+# What text_stream() decodes bytes that are not UTF-8 to
+UNDECODABLE = '\ufffd'
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def guess_format(filename):
+    if filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+def text_stream(binary_file):
+    """Wrap an uploaded or opened binary file for line-by-line decoding.
+
+    Bytes that are not UTF-8 decode to UNDECODABLE rather than failing the
+    whole file; clean_row() rejects the rows they land in.
+    """
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def iter_csv_rows(stream):
+    """Yield (line_number, row) pairs from a CSV file with a header row."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_ndjson_rows(stream):
+    """Yield (line_number, row) pairs from newline-delimited JSON objects."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def iter_rows(stream, fmt):
+    if fmt == 'ndjson':
+        return iter_ndjson_rows(stream)
+    return iter_csv_rows(stream)
+
+
+def clean_row(row):
+    """Validate one row with ExpenseForm's field rules; returns (data, errors)."""
+    values, errors = posted_values({name: row.get(name) for name in ExpenseForm.base_fields})
+    data = {}
+    for name, value in values.items():
+        value = value if value is not None else ''
+        if UNDECODABLE in value:
+            errors[name] = ['Not valid UTF-8 text; save the file as UTF-8.']
+            continue
+        try:
+            data[name] = ExpenseForm.base_fields[name].clean(value)
+        except ValidationError as exc:
+            errors[name] = list(exc.messages)
+    return data, errors
+
+
+def _flush(user, batch, result):
+    with transaction.atomic():
+        Expense.objects.bulk_create(batch)
+        rollups.apply_deltas(rollups.deltas_for(batch))
+        bump_version(user.pk)
+    result.created += len(batch)
+
+
+def import_expenses(user, rows, batch_size=BATCH_SIZE):
+    """Insert validated rows for user in chunked transactions.
+
+    Each chunk commits on its own, so a bad row only costs that row and an
+    interrupted import keeps everything before the failing chunk. Rows
+    without a currency are in the user's home currency.
+    """
+    result = ImportResult()
+    home = home_currency(user.pk)
+    batch = []
+    for line, row in rows:
+        if row is None:
+            result.add_error(line, {'__all__': ['Line is not a JSON object.']})
+            continue
+        data, errors = clean_row(row)
+        if errors:
+            result.add_error(line, errors)
+            continue
+        data['currency'] = data['currency'] or home
+        batch.append(Expense(user=user, **data))
+        if len(batch) >= batch_size:
+            _flush(user, batch, result)
+            batch = []
+    if batch:
+        _flush(user, batch, result)
+    return result
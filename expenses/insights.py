@@ -0,0 +1,233 @@
+import calendar
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .analytics import CATEGORY_CODES
+from .currency import home_amount, money
+from .archive import reaches_archive
+from .models import ArchivedExpense, Expense, SpendingInsight
+from .rows import CATEGORY_LABELS
+
+# Days of expenses the anomaly fences are fitted on
+HISTORY_DAYS = 365
+# Trailing days the daily spending rate is averaged over
+RATE_DAYS = 90
+# Only expenses this recent are reported as anomalies
+RECENT_DAYS = 30
+# A category needs this many expenses before any of them is flagged
+MIN_SAMPLES = 8
+Z_LIMIT = 3.0
+IQR_FACTOR = 1.5
+MAX_ANOMALIES = 5
+
+BATCH_SIZE = 500
+
+
+def _columns(user_ids, start, today):
+    """(ids, user ids, category indexes, days, amounts) arrays for the users' expenses in [start, today].
+
+    Amounts are in each user's home currency, converted by the query; NaN
+    where no exchange rate reaches back to the expense's date.
+    """
+    sources = [Expense.objects]
+    if reaches_archive(start, today):
+        sources.append(ArchivedExpense.objects)
+    rows = [
+        row
+        for source in sources
+        for row in source.filter(user_id__in=user_ids, date__gte=start, date__lte=today).order_by()
+        .values_list('id', 'user_id', 'category', 'date', home_amount())
+    ]
+    if not rows:
+        return None
+    ids, users, categories, days, amounts = zip(*rows)
+    index = {code: i for i, code in enumerate(CATEGORY_CODES)}
+    return (
+        np.array(ids, dtype=np.int64),
+        np.array(users, dtype=np.int64),
+        np.array([index.get(code, -1) for code in categories]),
+        np.array(days, dtype='datetime64[D]'),
+        np.array([np.nan if amount is None else amount for amount in amounts], dtype=float),
+    )
+
+
+def _quantile(sorted_amounts, starts, counts, q):
+    """Linearly interpolated q-quantile of each group of sorted_amounts (NaN for empty groups)."""
+    position = starts + q * np.maximum(counts - 1, 0)
+    low = np.minimum(np.floor(position).astype(np.int64), len(sorted_amounts) - 1)
+    high = np.minimum(np.ceil(position).astype(np.int64), len(sorted_amounts) - 1)
+    values = sorted_amounts[low] + (sorted_amounts[high] - sorted_amounts[low]) * (position - low)
+    return np.where(counts > 0, values, np.nan)
+
+
+def fences(groups, amounts, group_count):
+    """Per-group amount above which an expense is unusual, NaN below MIN_SAMPLES.
+
+    An expense must lie beyond both the z-score fence (mean + Z_LIMIT
+    standard deviations) and Tukey's IQR fence (Q3 + IQR_FACTOR * IQR).
+    The IQR fence alone flags too much of a skewed category; the z-score
+    fence alone is dragged up by the very outliers it should catch.
+    """
+    counts = np.bincount(groups, minlength=group_count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(groups, weights=amounts, minlength=group_count) / counts
+        variance = np.bincount(groups, weights=amounts * amounts, minlength=group_count) / counts - mean * mean
+    z_fence = mean + Z_LIMIT * np.sqrt(np.maximum(variance, 0))
+
+    order = np.lexsort((amounts, groups))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    q1 = _quantile(amounts[order], starts, counts, 0.25)
+    q3 = _quantile(amounts[order], starts, counts, 0.75)
+    iqr_fence = q3 + IQR_FACTOR * (q3 - q1)
+
+    return np.where(counts >= MIN_SAMPLES, np.maximum(z_fence, iqr_fence), np.nan)
+
+
+def forecast(groups, user_index, days, amounts, user_count, group_count, today):
+    """(spent this month, projected month-end total) per group.
+
+    The rest of the month is projected at the user's average daily spend in
+    that group over the last RATE_DAYS days, or since their first expense
+    if that is more recent.
+    """
+    remaining = calendar.monthrange(today.year, today.month)[1] - today.day
+    days = days.astype(np.int64)
+    month_start = np.datetime64(today.replace(day=1), 'D').astype(np.int64)
+    today = np.datetime64(today, 'D').astype(np.int64)
+
+    this_month = days >= month_start
+    spent = np.bincount(groups[this_month], weights=amounts[this_month], minlength=group_count)
+
+    rate_start = today - (RATE_DAYS - 1)
+    in_rate = days >= rate_start
+    first = np.full(user_count, today)
+    np.minimum.at(first, user_index, days)
+    span = today - np.maximum(first, rate_start) + 1
+    rate = np.bincount(groups[in_rate], weights=amounts[in_rate], minlength=group_count)
+    rate /= np.repeat(span, len(CATEGORY_CODES))
+
+    return spent, spent + rate * remaining
+
+
+def _money(value):
+    return Decimal(f'{value:.2f}')
+
+
+def _anomaly_details(ids):
+    return {
+        row['id']: {
+            'id': row['id'],
+            'date': row['date'].isoformat(),
+            'amount': str(row['amount']),
+            'currency': row['currency'],
+            'description': row['description'],
+        }
+        for row in Expense.objects.filter(id__in=ids).values('id', 'date', 'amount', 'currency', 'description')
+    }
+
+
+def _insights(user_ids, today):
+    """SpendingInsight rows for a batch of users, computed from one read of their expenses."""
+    columns = _columns(user_ids, today - timedelta(days=HISTORY_DAYS - 1), today)
+    if columns is None:
+        return []
+    ids, users, categories, days, amounts = columns
+    known = (categories >= 0) & ~np.isnan(amounts)
+    ids, users, categories, days, amounts = ids[known], users[known], categories[known], days[known], amounts[known]
+
+    batch = np.unique(users)
+    user_index = np.searchsorted(batch, users)
+    groups = user_index * len(CATEGORY_CODES) + categories
+    group_count = len(batch) * len(CATEGORY_CODES)
+
+    fence = fences(groups, amounts, group_count)
+    spent, projected = forecast(groups, user_index, days, amounts, len(batch), group_count, today)
+    counts = np.bincount(groups, minlength=group_count)
+
+    recent = (days > np.datetime64(today - timedelta(days=RECENT_DAYS), 'D')) & (amounts > fence[groups])
+    # Largest first, at most MAX_ANOMALIES per group
+    flagged = recent.nonzero()[0][np.lexsort((-amounts[recent], groups[recent]))]
+    per_group = {}
+    for row in flagged:
+        per_group.setdefault(groups[row], [])
+        if len(per_group[groups[row]]) < MAX_ANOMALIES:
+            per_group[groups[row]].append(int(ids[row]))
+    details = _anomaly_details([pk for pks in per_group.values() for pk in pks])
+
+    month = today.replace(day=1)
+    insights = []
+    for u, user_id in enumerate(batch.tolist()):
+        own = slice(u * len(CATEGORY_CODES), (u + 1) * len(CATEGORY_CODES))
+        insights.append(SpendingInsight(
+            user_id=user_id, category='', month=month, computed_on=today,
+            spent=_money(spent[own].sum()), projected=_money(projected[own].sum()),
+        ))
+        for c, code in enumerate(CATEGORY_CODES):
+            group = u * len(CATEGORY_CODES) + c
+            if not counts[group]:
+                continue
+            insights.append(SpendingInsight(
+                user_id=user_id, category=code, month=month, computed_on=today,
+                spent=_money(spent[group]), projected=_money(projected[group]),
+                unusual_above=None if np.isnan(fence[group]) else _money(fence[group]),
+                anomalies=[details[pk] for pk in per_group.get(group, []) if pk in details],
+            ))
+    return insights
+
+
+def compute_insights(today, batch_size=BATCH_SIZE):
+    """Recompute every active user's SpendingInsight rows; returns (users, rows written).
+
+    Users are taken in id order, batch_size at a time: one read of their
+    expenses, vectorized arithmetic, and one replace of their rows.
+    """
+    users = written = 0
+    last_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(id__gt=last_id, is_active=True).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return users, written
+        insights = _insights(user_ids, today)
+        with transaction.atomic():
+            SpendingInsight.objects.filter(user_id__in=user_ids).delete()
+            SpendingInsight.objects.bulk_create(insights)
+        users += len(user_ids)
+        written += len(insights)
+        last_id = user_ids[-1]
+
+
+def _dashboard_view(insights):
+    overall = next((insight for insight in insights if not insight.category), None)
+    anomalies = [
+        {
+            **anomaly,
+            'category': CATEGORY_LABELS.get(insight.category, insight.category),
+            'money': money(Decimal(anomaly['amount']), anomaly.get('currency', settings.DEFAULT_CURRENCY)),
+        }
+        for insight in insights
+        for anomaly in insight.anomalies
+    ]
+    anomalies.sort(key=lambda anomaly: anomaly['date'], reverse=True)
+    return {
+        'projected': overall.projected if overall else None,
+        'computed_on': overall.computed_on if overall else None,
+        'anomalies': anomalies[:MAX_ANOMALIES],
+    }
+
+
+def dashboard_insights(user, today):
+    """This month's forecast and recent unusual expenses, in one query."""
+    return _dashboard_view(list(SpendingInsight.objects.filter(user=user, month=today.replace(day=1))))
+
+
+async def adashboard_insights(user, today):
+    return _dashboard_view([
+        insight async for insight in SpendingInsight.objects.filter(user=user, month=today.replace(day=1))
+    ])
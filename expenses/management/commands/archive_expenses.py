@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.archive import BATCH_SIZE, archive_before, archive_cutoff, restore_since
+
+
+class Command(BaseCommand):
+    help = (
+        'Move expenses older than ARCHIVE_AFTER_MONTHS into the archive table, and archived '
+        'expenses newer than that back. Run it monthly; it is safe to rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows moved per transaction.')
+
+    def handle(self, *args, batch_size=BATCH_SIZE, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        if settings.ARCHIVE_AFTER_MONTHS < 1:
+            raise CommandError('ARCHIVE_AFTER_MONTHS must be at least 1.')
+
+        started = time.monotonic()
+        cutoff = archive_cutoff()
+        # Only finds rows after ARCHIVE_AFTER_MONTHS was raised
+        restored = restore_since(cutoff, batch_size)
+        archived = archive_before(cutoff, batch_size)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} and restored {restored} expenses around {cutoff} in {elapsed:.1f}s.'
+        ))
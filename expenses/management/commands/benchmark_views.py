@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from expenses.benchmarks import ITERATIONS, LATENCY_THRESHOLD, find_regressions, run_benchmarks
+from expenses.seeding import seed_expenses, seed_users
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the expenses views against a freshly seeded test database and '
+        'compare latency and query counts with a JSON baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=ITERATIONS)
+        parser.add_argument('--expenses', type=int, default=2000, help='Expenses seeded for the benchmark user.')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file.')
+        parser.add_argument('--threshold', type=float, default=LATENCY_THRESHOLD,
+                            help='Allowed p95 slowdown over the baseline, as a fraction.')
+        parser.add_argument('--save', action='store_true', help='Write these results as the new baseline.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, iterations=ITERATIONS, expenses=2000, baseline=None, threshold=LATENCY_THRESHOLD,
+               save=False, seed=0, **options):
+        baseline_path = Path(baseline or DEFAULT_BASELINE)
+        results = self.benchmark(iterations, expenses, seed)
+
+        self.stdout.write(f'{"view":<24}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<24}{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+                f'{result["p99_ms"]:>10.2f}{result["queries"]:>10}'
+            )
+
+        if save or not baseline_path.exists():
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps({
+                'settings': {'iterations': iterations, 'expenses': expenses, 'seed': seed},
+                'views': results,
+            }, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}.'))
+            return
+
+        recorded = json.loads(baseline_path.read_text())
+        problems = find_regressions(results, recorded['views'], threshold)
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f'{len(problems)} regression(s) against {baseline_path}.')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline_path}.'))
+
+    def benchmark(self, iterations, expenses, seed):
+        # Run against a throwaway test database, and keep cache entries apart
+        # from any shared cache the real site uses
+        caches = {alias: {**config, 'KEY_PREFIX': 'benchmark'} for alias, config in settings.CACHES.items()}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=caches):
+                user = seed_users(1, prefix='benchmark')[0]
+                seed_expenses([user], expenses, seed=seed)
+                client = Client()
+                client.force_login(user)
+                return run_benchmarks(client, user, iterations)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.sync import BATCH_SIZE, compact_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete delta sync tombstones older than SYNC_TOMBSTONE_DAYS. Sync tokens expire '
+        'before then, so no client misses a delete. Run it daily; it is safe to rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Tombstones deleted per statement.')
+
+    def handle(self, *args, batch_size=BATCH_SIZE, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        if settings.SYNC_TOMBSTONE_DAYS < 2:
+            raise CommandError('SYNC_TOMBSTONE_DAYS must be at least 2.')
+
+        started = time.monotonic()
+        deleted = compact_tombstones(batch_size)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} tombstones older than {settings.SYNC_TOMBSTONE_DAYS} days in {elapsed:.1f}s.'
+        ))
@@ -0,0 +1,34 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from expenses.insights import BATCH_SIZE, compute_insights
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's projected month-end totals and unusual-expense flags "
+        'for the dashboard. Run it nightly; it is safe to rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help='Compute as of this date (YYYY-MM-DD); defaults to today.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Users per query.')
+
+    def handle(self, *args, as_of=None, batch_size=BATCH_SIZE, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        try:
+            as_of = date.fromisoformat(as_of) if as_of else timezone.now().date()
+        except ValueError:
+            raise CommandError('--as-of must be a date in YYYY-MM-DD format.')
+
+        started = time.monotonic()
+        users, written = compute_insights(as_of, batch_size)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed {written} insights for {users} users as of {as_of} in {elapsed:.1f}s.'
+        ))
@@ -0,0 +1,43 @@
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.importers import BATCH_SIZE, IMPORT_FORMATS, guess_format, import_expenses, iter_rows, text_stream
+
+
+class Command(BaseCommand):
+    help = 'Stream-import expenses for a user from a CSV or NDJSON file ("-" reads stdin).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username that will own the imported expenses.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, path, user, format=None, batch_size=BATCH_SIZE, **options):
+        try:
+            owner = User.objects.get(username=user)
+        except User.DoesNotExist:
+            raise CommandError(f'No user named "{user}".')
+
+        fmt = format or guess_format(path)
+        started = time.monotonic()
+        if path == '-':
+            result = import_expenses(owner, iter_rows(text_stream(sys.stdin.buffer), fmt), batch_size)
+        else:
+            with open(path, 'rb') as fh:
+                result = import_expenses(owner, iter_rows(text_stream(fh), fmt), batch_size)
+        elapsed = time.monotonic() - started
+
+        for error in result.errors:
+            messages = '; '.join(f'{field}: {" ".join(msgs)}' for field, msgs in error['errors'].items())
+            self.stderr.write(f'line {error["line"]}: {messages}')
+        if result.failed > len(result.errors):
+            self.stderr.write(f'... {result.failed - len(result.errors)} more invalid rows not shown')
+
+        rate = result.created / elapsed if elapsed else result.created
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} expenses ({result.failed} rejected) in {elapsed:.1f}s, {rate:.0f} rows/s.'
+        ))
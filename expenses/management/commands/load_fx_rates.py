@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses.currency import CODE, rate_cache, read_rates
+from expenses.importers import text_stream
+from expenses.models import FxRate
+from expenses.rollups import reprice_for_rates
+
+
+class Command(BaseCommand):
+    help = (
+        'Load daily exchange rates from a CSV file with date, currency and rate columns, rates being units '
+        'of the currency per unit of --base. Days already loaded are overwritten, and the rollups of '
+        'expenses priced by the new rates are rebuilt.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--base', default=settings.DEFAULT_CURRENCY,
+            help='Currency the file quotes against; keep it the same for every load (default: DEFAULT_CURRENCY).',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, path, base=None, batch_size=1000, **options):
+        base = base.upper()
+        if not CODE.match(base):
+            raise CommandError('--base must be a three-letter currency code.')
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        started = time.monotonic()
+        try:
+            with open(path, 'rb') as fh:
+                rates = read_rates(text_stream(fh), base)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not rates:
+            raise CommandError('The file holds no rates.')
+
+        with transaction.atomic():
+            FxRate.objects.bulk_create(
+                rates, batch_size=batch_size, update_conflicts=True,
+                unique_fields=['currency', 'date'], update_fields=['rate'],
+            )
+            repriced = reprice_for_rates(min(rate.date for rate in rates))
+        rate_cache.clear()
+        elapsed = time.monotonic() - started
+
+        currencies = len({rate.currency for rate in rates})
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {len(rates)} rates for {currencies} currencies and repriced {repriced} users in {elapsed:.1f}s.'
+        ))
@@ -0,0 +1,31 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from expenses.recurring import BATCH_SIZE, materialize_due
+
+
+class Command(BaseCommand):
+    help = 'Create every due expense from the recurring expense rules of all users. Safe to rerun.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Materialize occurrences up to this date (YYYY-MM-DD); defaults to today.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rules per transaction.')
+
+    def handle(self, *args, until=None, batch_size=BATCH_SIZE, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        try:
+            until = date.fromisoformat(until) if until else timezone.now().date()
+        except ValueError:
+            raise CommandError('--until must be a date in YYYY-MM-DD format.')
+
+        started = time.monotonic()
+        rules, created = materialize_due(until, batch_size)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Materialized {created} expenses from {rules} due rules up to {until} in {elapsed:.1f}s.'
+        ))
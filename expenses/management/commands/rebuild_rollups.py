@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses.models import ArchivedExpense, Expense, MonthlyRollup
+from expenses.rollups import compute_rollups
+from expenses.versioning import bump_versions
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild (or with --verify, check) the monthly expense rollups from the Expense and archive tables. '
+        'Budget checks read these totals, so this also repairs budget drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Report drift without changing anything.')
+        parser.add_argument('--user', type=int, dest='user_id', help='Only process this user id.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, verify=False, user_id=None, batch_size=1000, **options):
+        expenses = Expense.objects.all()
+        archived = ArchivedExpense.objects.all()
+        stored = MonthlyRollup.objects.all()
+        if user_id is not None:
+            expenses = expenses.filter(user_id=user_id)
+            archived = archived.filter(user_id=user_id)
+            stored = stored.filter(user_id=user_id)
+
+        expected = compute_rollups(expenses, archived)
+
+        if verify:
+            self.verify(expected, stored)
+            return
+
+        with transaction.atomic():
+            user_ids = {rollup.user_id for rollup in expected}
+            user_ids.update(stored.order_by().values_list('user_id', flat=True).distinct())
+            stored.delete()
+            MonthlyRollup.objects.bulk_create(expected, batch_size=batch_size)
+            # Cached totals are keyed by data version; without a bump they outlive the repair
+            bump_versions(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(expected)} rollup rows.'))
+
+    def verify(self, expected, stored):
+        def bucket(rollup):
+            return (rollup.user_id, rollup.year, rollup.month, rollup.category)
+
+        expected = {bucket(r): (r.total, r.count) for r in expected}
+        actual = {
+            bucket(r): (r.total, r.count)
+            for r in stored.iterator()
+            # Emptied buckets are left behind by deletes and carry no data
+            if r.count or r.total
+        }
+
+        drift = 0
+        for key in sorted(expected.keys() | actual.keys()):
+            want = expected.get(key, (0, 0))
+            have = actual.get(key, (0, 0))
+            if want != have:
+                drift += 1
+                self.stdout.write(f'{key}: expected total={want[0]} count={want[1]}, found total={have[0]} count={have[1]}')
+
+        if drift:
+            raise CommandError(f'{drift} rollup bucket(s) out of sync; run rebuild_rollups to repair.')
+        self.stdout.write(self.style.SUCCESS(f'All {len(expected)} rollup buckets match.'))
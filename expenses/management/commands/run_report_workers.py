@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.reports import run_workers
+
+
+class Command(BaseCommand):
+    help = (
+        'Build queued statements in a pool of worker processes. Runs until stopped; '
+        'with --once it exits when the queue is empty.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.REPORT_WORKERS,
+            help='Worker processes; 1 builds reports in this process.',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between checks of an empty queue.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, processes=None, poll_interval=1.0, once=False, **options):
+        if processes < 1:
+            raise CommandError('--processes must be positive.')
+        if poll_interval <= 0:
+            raise CommandError('--poll-interval must be positive.')
+
+        started = time.monotonic()
+        try:
+            done = run_workers(processes, poll_interval, once)
+        except KeyboardInterrupt:
+            return
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Built {done} reports with {processes} processes in {elapsed:.1f}s.'))
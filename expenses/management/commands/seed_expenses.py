@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.seeding import BATCH_SIZE, SEED_PASSWORD, seed_expenses, seed_users
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users and expenses for development and benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users to create or reuse.')
+        parser.add_argument('--expenses', type=int, default=1000, help='Expenses to add per user.')
+        parser.add_argument('--days', type=int, default=365, help='Spread expense dates over this many past days.')
+        parser.add_argument('--prefix', default='seed_user', help='Username prefix for generated users.')
+        parser.add_argument('--seed', type=int, help='Random seed, for repeatable data.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, users=10, expenses=1000, days=365, prefix='seed_user', seed=None,
+               batch_size=BATCH_SIZE, **options):
+        if users < 1 or expenses < 0 or days < 1:
+            raise CommandError('--users and --days must be positive and --expenses non-negative.')
+
+        started = time.monotonic()
+        accounts = seed_users(users, prefix)
+        created = seed_expenses(accounts, expenses, days, seed, batch_size)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {created} expenses for {len(accounts)} users in {elapsed:.1f}s '
+            f'(log in as {prefix}_1 / {SEED_PASSWORD}).'
+        ))
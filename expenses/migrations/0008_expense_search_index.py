@@ -0,0 +1,88 @@
+from django.db import migrations
+
+# The index as first installed, frozen here so that 0018 can restore it when
+# reversed. Later migrations reinstall the current index from expenses.search.
+FTS_TABLE = 'expenses_expense_fts'
+
+# External-content FTS5 index over Expense.description. The trigram tokenizer
+# gives substring matches, so results agree with the old icontains filter.
+# Triggers keep it in sync with every write, including bulk and raw SQL.
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description, content='expenses_expense', content_rowid='id', tokenize='trigram'
+    )""",
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF description ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+POSTGRES_TRGM_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # icontains compiles to UPPER(description) LIKE UPPER(%s), so index that expression
+    'CREATE INDEX IF NOT EXISTS expense_description_trgm_idx '
+    'ON expenses_expense USING gin (UPPER(description) gin_trgm_ops)',
+]
+
+
+def has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def install_search_index(schema_editor):
+    """Create (or repair) the database search index for the current vendor.
+
+    Idempotent, so repeating this migration's work is always safe.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        if not has_fts5(schema_editor.connection):
+            return
+        statements = SQLITE_FTS_SQL
+    elif vendor == 'postgresql':
+        statements = POSTGRES_TRGM_SQL
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def uninstall_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS expense_description_trgm_idx')
+
+
+def forwards(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_expense_user_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-17 06:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_expense_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date', 'category', 'amount'], name='expense_user_analytics_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.11 on 2026-10-17 08:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from expenses.search import install_search_index
+
+
+def stamp_existing(apps, schema_editor):
+    # Existing rows count as last changed at their owner's current version
+    DataVersion = apps.get_model('expenses', 'DataVersion')
+    version = Coalesce(
+        Subquery(DataVersion.objects.filter(user_id=OuterRef('user_id')).values('version')[:1]),
+        Value(0),
+    )
+    for name in ('Expense', 'ArchivedExpense'):
+        apps.get_model('expenses', name).objects.update(updated_at=F('created_at'), change_seq=version)
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Adding updated_at rebuilds expenses_expense on SQLite, dropping the FTS triggers
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0012_archivedexpense'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedexpense',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='archivedexpense',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(stamp_existing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'change_seq', 'id'], name='expense_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedexpense',
+            index=models.Index(fields=['user', 'change_seq', 'id'], name='archived_user_change_idx'),
+        ),
+        migrations.CreateModel(
+            name='ExpenseTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expense_id', models.BigIntegerField()),
+                ('change_seq', models.PositiveBigIntegerField(null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_tombstones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', 'change_seq', 'expense_id'], name='tombstone_user_change_idx'),
+                    models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0013_expense_sync'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['-date', '-created_at', '-id'], name='expense_date_idx'),
+        ),
+    ]
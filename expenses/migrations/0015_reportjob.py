@@ -0,0 +1,38 @@
+# Generated by Django 5.2.11 on 2026-10-17 07:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0014_expense_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('month', 'Monthly'), ('year', 'Yearly')], max_length=5)),
+                ('start', models.DateField()),
+                ('format', models.CharField(choices=[('html', 'HTML (printable)'), ('xlsx', 'Excel (XLSX)'), ('csv', 'CSV')], max_length=4)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=7)),
+                ('data_version', models.PositiveBigIntegerField(null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['queued_at', 'id'], name='report_queue_idx'), models.Index(condition=models.Q(('status', 'running')), fields=['started_at'], name='report_running_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'start', 'format'), name='unique_report')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-17 07:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0015_reportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingInsight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, choices=[('food', 'Food'), ('transport', 'Transport'), ('bills', 'Bills'), ('shopping', 'Shopping'), ('other', 'Other')], max_length=50)),
+                ('month', models.DateField()),
+                ('spent', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('projected', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('unusual_above', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('anomalies', models.JSONField(default=list)),
+                ('computed_on', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_insights', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='unique_spending_insight')],
+            },
+        ),
+    ]
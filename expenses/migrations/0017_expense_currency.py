@@ -0,0 +1,69 @@
+# Generated by Django 5.2.11 on 2026-10-17 07:43
+
+import django.db.models.deletion
+import expenses.models
+from django.conf import settings
+from django.db import migrations, models
+
+from expenses.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Adding currency rebuilds expenses_expense on SQLite, dropping the FTS triggers
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('expenses', '0016_spendinginsight'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HomeCurrency',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='home_currency', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('currency', models.CharField(max_length=3)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_user_analytics_idx',
+        ),
+        migrations.AddField(
+            model_name='archivedexpense',
+            name='currency',
+            field=models.CharField(default=expenses.models.default_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='currency',
+            field=models.CharField(default=expenses.models.default_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='currency',
+            field=models.CharField(default=expenses.models.default_currency, max_length=3),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date', 'category', 'amount', 'currency'], name='expense_user_analytics_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='fxrate',
+            constraint=models.UniqueConstraint(fields=('currency', 'date'), name='unique_fx_rate'),
+        ),
+    ]
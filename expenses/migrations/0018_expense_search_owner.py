@@ -0,0 +1,76 @@
+from importlib import import_module
+
+from django.db import migrations
+
+initial = import_module('expenses.migrations.0008_expense_search_index')
+
+FTS_TABLE = 'expenses_expense_fts'
+
+# Contentless FTS5 index over Expense.description, plus an owner column
+# holding 'u<user_id>u'. Searches match the owner token as well, so FTS5
+# intersects the description match with one user's rows inside the index
+# instead of matching every user's rows first. The delimiters keep user 4's
+# token from matching inside user 42's. Triggers keep it in sync with every
+# write, including bulk and raw SQL.
+OWNER = "'u' || {row}.user_id || 'u'"
+
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description, owner, content='', tokenize='trigram'
+    )""",
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, owner) VALUES (new.id, new.description, {OWNER.format(row='new')});
+    END""",
+    # A contentless index forgets a row given exactly the values it was indexed with
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, owner)
+        VALUES ('delete', old.id, old.description, {OWNER.format(row='old')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF description, user_id ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, owner)
+        VALUES ('delete', old.id, old.description, {OWNER.format(row='old')});
+        INSERT INTO {FTS_TABLE}(rowid, description, owner) VALUES (new.id, new.description, {OWNER.format(row='new')});
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f"""INSERT INTO {FTS_TABLE}(rowid, description, owner)
+        SELECT id, description, {OWNER.format(row='expenses_expense')} FROM expenses_expense""",
+]
+
+
+def install_search_index(schema_editor):
+    """Create (or repair) the per-user SQLite search index.
+
+    Frozen copy of expenses.search.install_search_index as of this
+    migration. PostgreSQL keeps the trigram index from 0008.
+    """
+    if schema_editor.connection.vendor != 'sqlite' or not initial.has_fts5(schema_editor.connection):
+        return
+    for statement in SQLITE_FTS_SQL:
+        schema_editor.execute(statement)
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        # The first index has no owner column; a virtual table cannot gain one
+        initial.uninstall_search_index(schema_editor)
+    install_search_index(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        initial.uninstall_search_index(schema_editor)
+        initial.install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0017_expense_currency'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-17 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0018_expense_search_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='by_weekday',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
@@ -1,5 +1,12 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+def default_currency():
+    return settings.DEFAULT_CURRENCY
+
 
 class Expense(models.Model):
     CATEGORY_CHOICES = [
@@ -12,13 +19,290 @@ class Expense(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # ISO 4217 code of amount; totals convert it to the owner's home currency (see currency.py)
+    currency = models.CharField(max_length=3, default=default_currency)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
     description = models.CharField(max_length=255, blank=True)
     date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # The owner's data version at the last write, for delta sync (see sync.py).
+    # Writes leave it NULL and bumping the version stamps it, in the same transaction.
+    change_seq = models.PositiveBigIntegerField(null=True, editable=False)
+    # Set on expenses generated from a recurring rule; one per rule and date
+    recurring = models.ForeignKey(
+        'RecurringExpense', on_delete=models.SET_NULL, null=True, blank=True, related_name='expenses',
+    )
+
+    class Meta:
+        ordering = ['-date', '-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['recurring', 'date'], name='unique_recurring_occurrence'),
+        ]
+        indexes = [
+            # Serves the keyset pagination order (see pagination.KEYSET_ORDERING)
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='expense_user_keyset_idx'),
+            # Covers the analytics grouping, currency conversion included, so range scans never visit the table
+            models.Index(fields=['user', 'date', 'category', 'amount', 'currency'], name='expense_user_analytics_idx'),
+            # Delta sync reads, and version bumps stamp, through this
+            models.Index(fields=['user', 'change_seq', 'id'], name='expense_user_change_idx'),
+            # The admin's all-users changelist: its ordering, date_hierarchy and date ranges
+            models.Index(fields=['-date', '-created_at', '-id'], name='expense_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} - {self.amount} {self.currency} on {self.date}"
+
+    def save(self, *args, **kwargs):
+        self.change_seq = None
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at', 'change_seq'}
+        super().save(*args, **kwargs)
+
+
+
+class ArchivedExpense(models.Model):
+    """Cold storage for expenses older than ARCHIVE_AFTER_MONTHS; see archive.py.
+
+    Rows keep their Expense id and columns. Rollups cover archived rows too.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_expenses')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default=default_currency)
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    description = models.CharField(max_length=255, blank=True)
+    date = models.DateField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    change_seq = models.PositiveBigIntegerField(null=True)
+    recurring = models.ForeignKey(
+        'RecurringExpense', on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_expenses',
+    )
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='archived_user_keyset_idx'),
+            models.Index(fields=['user', 'change_seq', 'id'], name='archived_user_change_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} - {self.amount} {self.currency} on {self.date} (archived)"
+
+
+class ExpenseTombstone(models.Model):
+    """Records a deleted expense so delta sync can report it; see sync.py.
+
+    Stamped like Expense.change_seq. compact_tombstones removes them once
+    they are older than SYNC_TOMBSTONE_DAYS, after every sync token that
+    could still need them has expired.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_tombstones')
+    expense_id = models.BigIntegerField()
+    change_seq = models.PositiveBigIntegerField(null=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq', 'expense_id'], name='tombstone_user_change_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} deleted {self.expense_id} at v{self.change_seq}"
+
+
+class MonthlyRollup(models.Model):
+    """Running per-user monthly totals in the user's home currency, kept in step with every Expense write."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_rollups')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'year', 'month', 'category'],
+                name='unique_monthly_rollup',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.year}-{self.month:02d} {self.category}: ${self.total} ({self.count})"
+
+
+class DataVersion(models.Model):
+    """Per-user counter bumped on every Expense write, used for ETags, cache keys and change_seq."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='expense_data_version')
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
+
+class FxRate(models.Model):
+    """A daily exchange rate loaded by load_fx_rates; see currency.py.
+
+    rate is the units of currency one unit of the loaded file's base
+    currency buys, so converting between two currencies divides their
+    rates. A day without a row uses the currency's latest earlier rate.
+    """
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+
+    class Meta:
+        constraints = [
+            # Also serves every "latest rate on or before this day" lookup
+            models.UniqueConstraint(fields=['currency', 'date'], name='unique_fx_rate'),
+        ]
+
+    def __str__(self):
+        return f"{self.currency} {self.date}: {self.rate}"
+
+
+class HomeCurrency(models.Model):
+    """The currency a user's totals, budgets and rollups are kept in, when not DEFAULT_CURRENCY."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='home_currency')
+    currency = models.CharField(max_length=3)
+
+    def __str__(self):
+        return f"{self.user_id} {self.currency}"
+
+
+class Budget(models.Model):
+    """A user's monthly spending limit for one category in their home currency, checked against the rollups."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_budgets')
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ['category']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='unique_category_budget'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.category}: ${self.amount}/month"
+
+
+class RecurringExpense(models.Model):
+    """A rule that generates an Expense every `interval` days, weeks, months or years.
+
+    Weekly rules may name their weekdays in by_weekday, as RRULE's BYDAY does.
+    next_date is the first occurrence not yet materialized; see recurring.py.
+    """
+    DAILY, WEEKLY, MONTHLY, YEARLY = 'daily', 'weekly', 'monthly', 'yearly'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (YEARLY, 'Yearly'),
+    ]
+    WEEKDAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_expenses')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default=default_currency)
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    description = models.CharField(max_length=255, blank=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=MONTHLY)
+    interval = models.PositiveSmallIntegerField(default=1)
+    # Comma-separated WEEKDAY_CODES in week order; blank repeats on start_date's weekday
+    by_weekday = models.CharField(max_length=20, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    next_date = models.DateField()
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['next_date', 'id']
+        indexes = [
+            # Finds the due rules without scanning finished or paused ones
+            models.Index(fields=['next_date', 'id'], name='recurring_due_idx', condition=models.Q(active=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.category} - ${self.amount} every {self.interval} {self.frequency} from {self.start_date}"
+
+
+class SpendingInsight(models.Model):
+    """A user's nightly month-end forecast and anomaly fence, per category; see insights.py."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_insights')
+    # Blank for all categories together
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES, blank=True)
+    # First day of the month forecast
+    month = models.DateField()
+    spent = models.DecimalField(max_digits=14, decimal_places=2)
+    projected = models.DecimalField(max_digits=14, decimal_places=2)
+    # Expenses above this are flagged; null with too little history
+    unusual_above = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    # The largest recent expenses above unusual_above, as
+    # {'id', 'date', 'amount', 'currency', 'description'} dicts
+    anomalies = models.JSONField(default=list)
+    computed_on = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='unique_spending_insight'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.category or 'all'} {self.month:%Y-%m}: {self.projected} projected"
+
+class ReportJob(models.Model):
+    """A user's monthly or yearly statement, built in the background; see reports.py.
+
+    There is one row per (user, period, start, format); asking for the
+    report again queues the same row once the data has changed.
+    """
+    MONTH, YEAR = 'month', 'year'
+    PERIOD_CHOICES = [
+        (MONTH, 'Monthly'),
+        (YEAR, 'Yearly'),
+    ]
+    HTML, XLSX, CSV = 'html', 'xlsx', 'csv'
+    FORMAT_CHOICES = [
+        (HTML, 'HTML (printable)'),
+        (XLSX, 'Excel (XLSX)'),
+        (CSV, 'CSV'),
+    ]
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    # First day of the month or year
+    start = models.DateField()
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=QUEUED)
+    # The owner's data version the finished file was built from
+    data_version = models.PositiveBigIntegerField(null=True)
+    error = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    queued_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period', 'start', 'format'], name='unique_report'),
+        ]
+        indexes = [
+            # Workers take the oldest queued jobs without scanning finished ones
+            models.Index(fields=['queued_at', 'id'], name='report_queue_idx', condition=models.Q(status='queued')),
+            # Finds jobs whose worker died
+            models.Index(fields=['started_at'], name='report_running_idx', condition=models.Q(status='running')),
+        ]
 
     def __str__(self):
-        return f"{self.category} - ${self.amount} on {self.date}"
+        return f"{self.user_id} {self.period} {self.start:%Y-%m} {self.format} ({self.status})"
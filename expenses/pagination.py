@@ -0,0 +1,104 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.db.models import Q
+
+from .archive import archive_cutoff
+
+# Expense.Meta.ordering plus the primary key, so every row has a unique position
+KEYSET_ORDERING = ('-date', '-created_at', '-id')
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _position(expense):
+    if isinstance(expense, dict):
+        return expense['date'], expense['created_at'], expense['id']
+    return expense.date, expense.created_at, expense.pk
+
+
+def encode_cursor(expense):
+    """Opaque cursor pointing just past the given expense (instance or values() row)."""
+    day, created_at, pk = _position(expense)
+    return base64.urlsafe_b64encode(json.dumps([day.isoformat(), created_at.isoformat(), pk]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        day, created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+        return date.fromisoformat(day), datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, TypeError, ValueError) as exc:
+        raise InvalidCursor('Invalid cursor.') from exc
+
+
+def after_cursor(queryset, cursor):
+    """Restrict a queryset to rows that sort after the cursor position."""
+    day, created_at, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(date__lt=day)
+        | Q(date=day, created_at__lt=created_at)
+        | Q(date=day, created_at=created_at, id__lt=pk)
+    )
+
+
+def _seek(queryset, cursor):
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    if cursor:
+        queryset = after_cursor(queryset, cursor)
+    return queryset
+
+
+def _needs_archive(expenses, page_size):
+    # Archived rows are all dated before the cutoff, so they can only belong
+    # on this page if the hot rows run out or reach back past it
+    return len(expenses) <= page_size or _position(expenses[-1])[0] < archive_cutoff()
+
+
+def _merge(expenses, archived, page_size):
+    return sorted(expenses + archived, key=_position, reverse=True)[:page_size + 1]
+
+
+def paginate(queryset, cursor=None, page_size=PAGE_SIZE, archived=None):
+    """Return (expenses, next_cursor) for one keyset page.
+
+    Seeks straight to the cursor through the (user, date, created_at, id)
+    index instead of counting past earlier rows with OFFSET. archived is the
+    same query over the archive table; it is only run when the page reaches
+    back far enough to need it, and its rows are merged in list order.
+    """
+    expenses = list(_seek(queryset, cursor)[:page_size + 1])
+    if archived is not None and _needs_archive(expenses, page_size):
+        expenses = _merge(expenses, list(_seek(archived, cursor)[:page_size + 1]), page_size)
+    return _page(expenses, page_size)
+
+
+async def apaginate(queryset, cursor=None, page_size=PAGE_SIZE, archived=None):
+    expenses = [expense async for expense in _seek(queryset, cursor)[:page_size + 1]]
+    if archived is not None and _needs_archive(expenses, page_size):
+        archived = [expense async for expense in _seek(archived, cursor)[:page_size + 1]]
+        expenses = _merge(expenses, archived, page_size)
+    return _page(expenses, page_size)
+
+
+def _page(expenses, page_size):
+    # One row past the page tells us whether another page exists
+    if len(expenses) > page_size:
+        expenses = expenses[:page_size]
+        return expenses, encode_cursor(expenses[-1])
+    return expenses, None
+
+
+def page_size_from(request, default=PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(request.GET.get('limit', default))
+    except ValueError:
+        return default
+    return max(1, min(size, maximum))
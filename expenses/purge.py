@@ -0,0 +1,28 @@
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+
+from accounts.purge import delete_in_batches
+from .models import ArchivedExpense, Expense, ExpenseTombstone, MonthlyRollup, RecurringExpense, ReportJob
+
+
+def purge_user_data(user, batch_size, pause):
+    """Empty the user's expense tables in batches (an ACCOUNT_PURGE_STEPS entry).
+
+    The raw deletes send no signals, so they leave no tombstones and bump no
+    data version; both go with the account. On SQLite the search index
+    triggers still fire.
+    """
+    # Nothing may add rows behind the purge
+    RecurringExpense.objects.filter(user=user, active=True).update(active=False)
+    ReportJob.objects.filter(user=user).delete()
+    for label, queryset in (
+        ('expenses', Expense.objects.filter(user=user)),
+        ('archived expenses', ArchivedExpense.objects.filter(user=user)),
+        ('tombstones', ExpenseTombstone.objects.filter(user=user)),
+        ('monthly rollups', MonthlyRollup.objects.filter(user=user)),
+    ):
+        for deleted in delete_in_batches(queryset, batch_size, pause):
+            yield label, deleted
+    shutil.rmtree(Path(settings.REPORT_CACHE_DIR) / str(user.pk), ignore_errors=True)
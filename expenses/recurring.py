@@ -0,0 +1,119 @@
+import calendar
+from datetime import timedelta
+
+from django.db import transaction
+
+from . import rollups
+from .archive import reaches_archive
+from .models import ArchivedExpense, Expense, RecurringExpense
+from .versioning import bump_versions
+
+BATCH_SIZE = 1000
+
+
+def _add_months(day, months):
+    # Clamp to the month's length, so a rule anchored on the 31st lands on
+    # the last day of shorter months and returns to the 31st afterwards
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def weekdays(rule):
+    """The weekdays (Monday is 0) a weekly rule repeats on, in week order."""
+    if not rule.by_weekday:
+        return [rule.start_date.weekday()]
+    return sorted(RecurringExpense.WEEKDAY_CODES.index(code) for code in rule.by_weekday.split(','))
+
+
+def first(rule):
+    """The rule's first occurrence: start_date, or its next listed weekday."""
+    if rule.frequency != RecurringExpense.WEEKLY or rule.start_date.weekday() in weekdays(rule):
+        return rule.start_date
+    return following(rule, rule.start_date)
+
+
+def following(rule, day):
+    """The occurrence after day, which must itself be an occurrence of rule."""
+    if rule.frequency == RecurringExpense.DAILY:
+        return day + timedelta(days=rule.interval)
+    if rule.frequency == RecurringExpense.WEEKLY:
+        # Like RRULE's BYDAY: the listed days of start_date's week, then of
+        # every interval-th week after it, weeks starting on Monday
+        days = weekdays(rule)
+        later = [weekday for weekday in days if weekday > day.weekday()]
+        if later:
+            return day + timedelta(days=later[0] - day.weekday())
+        return day + timedelta(weeks=rule.interval, days=days[0] - day.weekday())
+    # Months and years count from start_date, which keeps the day of the month
+    step = rule.interval * (12 if rule.frequency == RecurringExpense.YEARLY else 1)
+    elapsed = (day.year - rule.start_date.year) * 12 + day.month - rule.start_date.month
+    return _add_months(rule.start_date, elapsed + step)
+
+
+def _materialize(rules, today):
+    expenses = []
+    for rule in rules:
+        last = min(today, rule.end_date) if rule.end_date else today
+        day = rule.next_date
+        while day <= last:
+            expenses.append(Expense(
+                user_id=rule.user_id, amount=rule.amount, currency=rule.currency, category=rule.category,
+                description=rule.description, date=day, recurring=rule,
+            ))
+            day = following(rule, day)
+        # Now past today, or past end_date and finished
+        rule.next_date = day
+        if rule.end_date and day > rule.end_date:
+            rule.active = False
+
+    # An interrupted run, or a manual next_date reset, may already have
+    # created some of these; one date-windowed read finds them
+    if expenses:
+        start = min(e.date for e in expenses)
+        sources = [Expense.objects]
+        if reaches_archive(start, today):
+            sources.append(ArchivedExpense.objects)
+        existing = {
+            pair
+            for source in sources
+            for pair in source.filter(recurring__in=rules, date__gte=start, date__lte=today).values_list('recurring_id', 'date')
+        }
+        expenses = [e for e in expenses if (e.recurring_id, e.date) not in existing]
+
+    Expense.objects.bulk_create(expenses, batch_size=BATCH_SIZE)
+    rollups.apply_deltas(rollups.deltas_for(expenses))
+    # The rules are locked, so write back their new schedule with an upsert,
+    # as _apply_deltas_in_bulk does for rollups
+    RecurringExpense.objects.bulk_create(
+        rules, batch_size=BATCH_SIZE, update_conflicts=True,
+        unique_fields=['id'], update_fields=['next_date', 'active'],
+    )
+    bump_versions({e.user_id for e in expenses})
+    return len(expenses)
+
+
+def materialize_due(today, batch_size=BATCH_SIZE):
+    """Create every Expense due from active rules up to today, for all users.
+
+    Rules are taken in batches from the due-date index, each batch in its
+    own transaction. Every processed rule moves past today (or is finished),
+    so the next batch is simply the next set of due rules, and an
+    interrupted run resumes where it stopped. The (recurring, date) unique
+    constraint backs this up against concurrent runs.
+
+    Returns (rules processed, expenses created).
+    """
+    processed = created = 0
+    while True:
+        with transaction.atomic():
+            rules = list(
+                RecurringExpense.objects.select_for_update()
+                .filter(active=True, next_date__lte=today)
+                .order_by('next_date', 'id')[:batch_size]
+            )
+            if not rules:
+                return processed, created
+            created += _materialize(rules, today)
+        processed += len(rules)
@@ -0,0 +1,291 @@
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import currency
+from .archive import reaches_archive
+from .exports import EXPORT_FORMATS, export_rows, format_stream
+from .models import ArchivedExpense, Expense, ReportJob
+from .versioning import get_version
+
+REPORT_FORMATS = {'html': 'text/html; charset=utf-8', **EXPORT_FORMATS}
+
+# A job still running after REPORT_JOB_TIMEOUT is retried this many times in all
+MAX_ATTEMPTS = 3
+
+
+def period_bounds(period, day):
+    """(start, end) of the month or year containing day; end is exclusive."""
+    if period == ReportJob.YEAR:
+        start = day.replace(month=1, day=1)
+        return start, start.replace(year=start.year + 1)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def report_path(job, version):
+    """Where the report is cached: one file per (user, period, format, data version)."""
+    return (
+        Path(settings.REPORT_CACHE_DIR) / str(job.user_id)
+        / f'{job.period}-{job.start:%Y-%m}-v{version}.{job.format}'
+    )
+
+
+def request_report(user, period, day, fmt):
+    """Return the user's ReportJob for this report, queuing it unless a current copy is cached.
+
+    A file built at the user's current data version is served as it is;
+    otherwise the job is queued, unless it already is.
+    """
+    start = period_bounds(period, day)[0]
+    try:
+        with transaction.atomic():
+            job, _ = ReportJob.objects.get_or_create(user=user, period=period, start=start, format=fmt)
+    except IntegrityError:
+        job = ReportJob.objects.get(user=user, period=period, start=start, format=fmt)
+    if job.status in (ReportJob.QUEUED, ReportJob.RUNNING):
+        return job
+
+    version = get_version(user.pk)
+    if report_path(job, version).exists():
+        if job.status != ReportJob.DONE or job.data_version != version:
+            ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.DONE, data_version=version, error='')
+            job.refresh_from_db()
+        return job
+    # Only one of several concurrent requests moves it back to the queue
+    ReportJob.objects.filter(pk=job.pk).exclude(status__in=[ReportJob.QUEUED, ReportJob.RUNNING]).update(
+        status=ReportJob.QUEUED, queued_at=timezone.now(), attempts=0, error='',
+    )
+    job.refresh_from_db()
+    return job
+
+
+def claim_jobs(limit):
+    """Mark up to limit of the oldest queued jobs as running and return their ids.
+
+    Each claim is a conditional UPDATE, so concurrent worker processes
+    never take the same job, on SQLite as on PostgreSQL.
+    """
+    claimed = []
+    candidates = ReportJob.objects.filter(status=ReportJob.QUEUED).order_by('queued_at', 'id')
+    for pk in candidates.values_list('id', flat=True)[:limit * 2]:
+        if ReportJob.objects.filter(pk=pk, status=ReportJob.QUEUED).update(
+            status=ReportJob.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1,
+        ):
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def requeue_stale(now=None):
+    """Queue again jobs whose worker died mid-run; fail those out of attempts. Returns the number touched."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.REPORT_JOB_TIMEOUT)
+    stale = ReportJob.objects.filter(status=ReportJob.RUNNING, started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ReportJob.FAILED, error='The report took too long to build.', finished_at=timezone.now(),
+    )
+    return failed + stale.update(status=ReportJob.QUEUED, queued_at=timezone.now())
+
+
+def release_job(job_id, error):
+    """Queue again a running job whose worker was lost, or fail it once out of attempts; returns its status."""
+    running = ReportJob.objects.filter(pk=job_id, status=ReportJob.RUNNING)
+    if running.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ReportJob.FAILED, error=error[:255], finished_at=timezone.now(),
+    ):
+        return ReportJob.FAILED
+    running.update(status=ReportJob.QUEUED, queued_at=timezone.now())
+    return ReportJob.QUEUED
+
+
+def _report_sources(job):
+    """The period's expenses, and its archived expenses if the archive reaches back that far."""
+    start, end = period_bounds(job.period, job.start)
+    sources = [Expense.objects.filter(user_id=job.user_id, date__gte=start, date__lt=end)]
+    if reaches_archive(start):
+        sources.append(ArchivedExpense.objects.filter(user_id=job.user_id, date__gte=start, date__lt=end))
+    return sources
+
+
+def _category_totals(sources, home):
+    """{category: [total in home, count]}, grouped and converted in the database."""
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    for source in sources:
+        grouped = (
+            source.order_by().values('category')
+            .annotate(total=Sum(currency.home_amount(home), default=0), count=Count('id'))
+            .values_list('category', 'total', 'count')
+        )
+        for category, total, count in grouped:
+            totals[category][0] += Decimal(total).quantize(currency.CENTS)
+            totals[category][1] += count
+    return totals
+
+
+class _StatementRows:
+    """The statement's rows, oldest first, made one at a time as the template loops.
+
+    The for tag lists anything without a len(), so the count from the
+    totals is given to keep it streaming from the query.
+    """
+
+    def __init__(self, rows, count, labels):
+        self.rows, self.count, self.labels = rows, count, labels
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for pk, day, category, amount, code, description, created_at in self.rows:
+            yield {
+                'date': day, 'category': self.labels.get(category, category),
+                'amount': currency.money(amount, code), 'description': description,
+            }
+
+
+def _statement_html(job, rows, totals, home):
+    labels = dict(Expense.CATEGORY_CHOICES)
+    count = sum(count for total, count in totals.values())
+    total = sum((total for total, count in totals.values()), Decimal('0'))
+    return render_to_string('expenses/reports/statement.html', {
+        'job': job,
+        'end': period_bounds(job.period, job.start)[1] - timedelta(days=1),
+        'home_currency': home,
+        'categories': [
+            {'label': labels.get(category, category), 'total': currency.money(total, home), 'count': count}
+            for category, (total, count) in sorted(totals.items(), key=lambda item: -item[1][0])
+        ],
+        'count': count,
+        'total': currency.money(total, home),
+        'rows': _StatementRows(rows, count, labels),
+    })
+
+
+def build_report(job):
+    """Write job's report to the cache unless it is already there; returns the version built."""
+    # Read before the rows, so the file never claims a newer version than it shows
+    version = get_version(job.user_id)
+    path = report_path(job, version)
+    if path.exists():
+        return version
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f'{path.name}.{os.getpid()}.partial')
+    sources = _report_sources(job)
+    try:
+        if job.format == ReportJob.HTML:
+            home = currency.home_currency(job.user_id)
+            rows = export_rows(*sources, oldest_first=True)
+            partial.write_text(_statement_html(job, rows, _category_totals(sources, home), home), encoding='utf-8')
+        else:
+            with partial.open('wb') as output:
+                for chunk in format_stream(export_rows(*sources), job.format):
+                    output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        os.replace(partial, path)
+    finally:
+        partial.unlink(missing_ok=True)
+
+    # Older versions of the same report can never be served again
+    for old in path.parent.glob(f'{job.period}-{job.start:%Y-%m}-v*.{job.format}'):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return version
+
+
+def run_job(job_id):
+    """Build one claimed job and record the outcome; returns its final status."""
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        version = build_report(job)
+    except Exception as exc:
+        ReportJob.objects.filter(pk=job_id).update(
+            status=ReportJob.FAILED, error=str(exc)[:255] or type(exc).__name__, finished_at=timezone.now(),
+        )
+        return ReportJob.FAILED
+    ReportJob.objects.filter(pk=job_id, status=ReportJob.RUNNING).update(
+        status=ReportJob.DONE, data_version=version, finished_at=timezone.now(),
+    )
+    return ReportJob.DONE
+
+
+def run_workers(processes=None, poll_interval=1.0, once=False):
+    """Run queued jobs in a pool of processes until stopped; returns the number run.
+
+    The queue is the ReportJob table, so no broker is needed. With once,
+    return when the queue is empty. With a single process, jobs run in this
+    one, which is also how the tests run them.
+    """
+    processes = processes or settings.REPORT_WORKERS
+    if processes == 1:
+        done = 0
+        while True:
+            requeue_stale()
+            claimed = claim_jobs(1)
+            if claimed:
+                run_job(claimed[0])
+                done += 1
+            elif once:
+                return done
+            else:
+                time.sleep(poll_interval)
+
+    running, done, pool = {}, 0, None
+    try:
+        while True:
+            if pool is None:
+                # Spawned workers set Django up afresh rather than sharing this
+                # process's database connections, as forked ones would
+                pool = ProcessPoolExecutor(
+                    processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+                )
+            requeue_stale()
+            broken = False
+            if len(running) < processes:
+                for pk in claim_jobs(processes - len(running)):
+                    try:
+                        running[pool.submit(run_job, pk)] = pk
+                    except BrokenProcessPool as exc:
+                        release_job(pk, str(exc) or type(exc).__name__)
+                        broken = True
+            if not running and not broken:
+                if once:
+                    return done
+                time.sleep(poll_interval)
+                continue
+            finished = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)[0] if running else ()
+            for future in finished:
+                pk = running.pop(future)
+                try:
+                    future.result()
+                except Exception as exc:
+                    # A worker process died (or the job vanished): retry or fail
+                    # this job alone and keep serving the rest of the queue
+                    release_job(pk, str(exc) or type(exc).__name__)
+                    broken = broken or isinstance(exc, BrokenProcessPool)
+            done += len(finished)
+            if broken:
+                # Nothing more runs in a broken pool; release what it still holds
+                # (finished jobs are no longer RUNNING, so stay as they are)
+                for pk in running.values():
+                    release_job(pk, 'A report worker process died.')
+                done += len(running)
+                running.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+    finally:
+        if pool is not None:
+            pool.shutdown()
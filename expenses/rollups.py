@@ -0,0 +1,273 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+
+from . import currency
+from .models import ArchivedExpense, Expense, HomeCurrency, MonthlyRollup
+from .versioning import bump_versions
+
+CENTS = Decimal('0.01')
+
+# Rows converted per rate lookup when deltas_for_queryset prices them in Python
+CONVERT_CHUNK_SIZE = 2000
+
+
+def _key(user_id, date, category):
+    return (user_id, date.year, date.month, category)
+
+
+def _owner_home():
+    return Coalesce(F('user__home_currency__currency'), Value(settings.DEFAULT_CURRENCY))
+
+
+def snapshot(expense):
+    """Capture the fields that place an expense in a rollup bucket."""
+    return {
+        'user_id': expense.user_id,
+        'date': expense.date,
+        'category': expense.category,
+        'amount': expense.amount,
+        'currency': expense.currency,
+    }
+
+
+def deltas_for(expenses, sign=1):
+    """Group expenses (or snapshots) into rollup deltas keyed by bucket.
+
+    Amounts are converted to each owner's home currency; one query reads
+    the rates when any expense is in another currency. An expense without
+    a rate counts, at zero, just as deltas_for_queryset counts it.
+    """
+    expenses = [expense if isinstance(expense, dict) else snapshot(expense) for expense in expenses]
+    homes = currency.home_currencies({expense['user_id'] for expense in expenses}) if expenses else {}
+    return _priced_deltas(expenses, homes, sign)
+
+
+def _priced_deltas(expenses, homes, sign):
+    rates = currency.rates_for(
+        (expense['currency'], homes[expense['user_id']], expense['date']) for expense in expenses
+    )
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for expense in expenses:
+        amount = rates.convert(expense['amount'], expense['currency'], homes[expense['user_id']], expense['date'])
+        delta = deltas[_key(expense['user_id'], expense['date'], expense['category'])]
+        delta[0] += sign * (amount or 0)
+        delta[1] += sign
+    return deltas
+
+
+def deltas_for_queryset(queryset, sign=1):
+    """Like deltas_for, but grouped in the database instead of in Python.
+
+    Rows in their owner's home currency are summed there. Rows that need
+    converting are read and priced as deltas_for prices them, a chunk at a
+    time: SQLite multiplies rates as floats, so its rounding of a half cent
+    can differ from the Decimal rounding every per-row write uses.
+    """
+    queryset = queryset.order_by().annotate(home=_owner_home())
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    rows = (
+        queryset.filter(currency=F('home'))
+        .values('user_id', 'category', year=ExtractYear('date'), month=ExtractMonth('date'))
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    for row in rows:
+        delta = deltas[(row['user_id'], row['year'], row['month'], row['category'])]
+        # SQLite sums decimals as floats; round back to the column's precision
+        delta[0] += sign * Decimal(row['total'] or 0).quantize(CENTS)
+        delta[1] += sign * row['count']
+
+    # Homes come from the same query, not the cache, which may be mid-change
+    converted = queryset.exclude(currency=F('home')).values('user_id', 'date', 'category', 'amount', 'currency', 'home')
+    chunk = []
+    for row in converted.iterator(chunk_size=CONVERT_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == CONVERT_CHUNK_SIZE:
+            deltas = merge_deltas(deltas, _priced_deltas(chunk, _homes(chunk), sign))
+            chunk = []
+    return merge_deltas(deltas, _priced_deltas(chunk, _homes(chunk), sign)) if chunk else deltas
+
+
+def _homes(rows):
+    return {row['user_id']: row['home'] for row in rows}
+
+
+def merge_deltas(*groups):
+    merged = defaultdict(lambda: [Decimal('0'), 0])
+    for deltas in groups:
+        for key, (amount, count) in deltas.items():
+            merged[key][0] += amount
+            merged[key][1] += count
+    return merged
+
+
+def apply_deltas(deltas):
+    """Add each delta to its rollup row, creating the row on first use.
+
+    Must run inside the same transaction as the Expense write it mirrors.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if len(deltas) > 1:
+        try:
+            with transaction.atomic():
+                _apply_deltas_in_bulk(deltas)
+            return
+        except IntegrityError:
+            # A concurrent write created one of the new buckets; go row by row
+            pass
+    for key, delta in deltas.items():
+        _apply_delta(key, delta)
+
+
+def _apply_delta(key, delta):
+    user_id, year, month, category = key
+    amount, count = delta
+    bucket = MonthlyRollup.objects.filter(
+        user_id=user_id, year=year, month=month, category=category,
+    )
+    if bucket.update(total=F('total') + amount, count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            MonthlyRollup.objects.create(
+                user_id=user_id, year=year, month=month, category=category,
+                total=amount, count=count,
+            )
+    except IntegrityError:
+        # Another request created the bucket between our update and insert.
+        bucket.update(total=F('total') + amount, count=F('count') + count)
+
+
+def _apply_deltas_in_bulk(deltas):
+    """One locked read, one bulk update and one bulk insert for many buckets."""
+    candidates = MonthlyRollup.objects.select_for_update().filter(
+        user_id__in={key[0] for key in deltas},
+        year__in={key[1] for key in deltas},
+        month__in={key[2] for key in deltas},
+    )
+    existing = {
+        (rollup.user_id, rollup.year, rollup.month, rollup.category): rollup
+        for rollup in candidates
+    }
+    changed, created = [], []
+    for key, (amount, count) in deltas.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            user_id, year, month, category = key
+            created.append(MonthlyRollup(
+                user_id=user_id, year=year, month=month, category=category,
+                total=amount, count=count,
+            ))
+        else:
+            rollup.total += amount
+            rollup.count += count
+            changed.append(rollup)
+    # The existing rows are locked, so writing back their new totals with an
+    # upsert is safe and compiles far cheaper than bulk_update's CASE WHEN.
+    MonthlyRollup.objects.bulk_create(
+        changed, batch_size=500, update_conflicts=True,
+        unique_fields=['user', 'year', 'month', 'category'], update_fields=['total', 'count'],
+    )
+    MonthlyRollup.objects.bulk_create(created, batch_size=500)
+
+
+def record_created(expense):
+    apply_deltas(deltas_for([expense]))
+
+
+def record_updated(previous, expense):
+    """Move an expense between buckets given its snapshot from before the edit."""
+    apply_deltas(merge_deltas(deltas_for([previous], sign=-1), deltas_for([expense])))
+
+
+def record_deleted(expense):
+    apply_deltas(deltas_for([expense], sign=-1))
+
+
+def dashboard_totals(user, today):
+    """Return (monthly_total, expense_count) for the dashboard from the rollups."""
+    totals = MonthlyRollup.objects.filter(user=user).aggregate(
+        monthly_total=Sum('total', filter=Q(year=today.year, month=today.month)),
+        expense_count=Sum('count'),
+    )
+    return totals['monthly_total'] or 0, totals['expense_count'] or 0
+
+
+async def adashboard_totals(user, today):
+    totals = await MonthlyRollup.objects.filter(user=user).aaggregate(
+        monthly_total=Sum('total', filter=Q(year=today.year, month=today.month)),
+        expense_count=Sum('count'),
+    )
+    return totals['monthly_total'] or 0, totals['expense_count'] or 0
+
+
+def compute_rollups(*querysets):
+    """Rebuild rollup rows from raw expense rows (unsaved instances).
+
+    The rollups count archived expenses too, so by default both the
+    Expense table and the archive are read.
+    """
+    if not querysets:
+        querysets = (Expense.objects.all(), ArchivedExpense.objects.all())
+    deltas = merge_deltas(*(deltas_for_queryset(queryset) for queryset in querysets))
+    return [
+        MonthlyRollup(
+            user_id=user_id, year=year, month=month, category=category,
+            total=amount, count=count,
+        )
+        for (user_id, year, month, category), (amount, count) in deltas.items()
+    ]
+
+
+def reprice_rollups(user_ids, since=None):
+    """Rebuild the users' rollups from since's month on (None: all of them); returns the rows written.
+
+    For when their expenses' converted amounts change under them: a new
+    home currency, or newly loaded exchange rates. Bumps their versions, so
+    cached totals go too. Call inside a transaction.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return 0
+    expenses = Expense.objects.filter(user_id__in=user_ids)
+    archived = ArchivedExpense.objects.filter(user_id__in=user_ids)
+    stored = MonthlyRollup.objects.filter(user_id__in=user_ids)
+    if since is not None:
+        expenses = expenses.filter(date__gte=since.replace(day=1))
+        archived = archived.filter(date__gte=since.replace(day=1))
+        stored = stored.filter(Q(year__gt=since.year) | Q(year=since.year, month__gte=since.month))
+    expected = compute_rollups(expenses, archived)
+    stored.delete()
+    MonthlyRollup.objects.bulk_create(expected, batch_size=500)
+    bump_versions(user_ids)
+    return len(expected)
+
+
+def reprice_for_rates(since):
+    """Re-price the rollups of everyone with expenses in a foreign currency from since on.
+
+    Call inside the transaction that loads rates for since and later: each
+    such day's rate also stands in for the days after it. Returns the
+    number of users repriced.
+    """
+    user_ids = set()
+    for model in (Expense, ArchivedExpense):
+        foreign = model.objects.filter(date__gte=since).annotate(home=_owner_home()).exclude(currency=F('home'))
+        user_ids.update(foreign.order_by().values_list('user_id', flat=True).distinct())
+    reprice_rollups(user_ids, since)
+    return len(user_ids)
+
+
+def change_home_currency(user, code):
+    """Switch the user's home currency and re-price all their rollups in it."""
+    with transaction.atomic():
+        HomeCurrency.objects.update_or_create(user=user, defaults={'currency': code})
+        reprice_rollups([user.pk])
+        # Now, and again once other connections can see the change
+        currency.forget_home_currency(user.pk)
+        transaction.on_commit(partial(currency.forget_home_currency, user.pk))
@@ -0,0 +1,89 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Value
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .currency import money, rate_cache
+from .models import ArchivedExpense, Expense
+
+ROW_FIELDS = ('id', 'date', 'category', 'amount', 'currency', 'description', 'created_at')
+ROW_TEMPLATE = 'expenses/_expense_row.html'
+ROW_TIMEOUT = 60 * 60
+
+CATEGORY_LABELS = dict(Expense.CATEGORY_CHOICES)
+
+
+def expense_rows(queryset):
+    """The columns a table row needs, as plain dicts instead of model instances."""
+    if queryset.model is ArchivedExpense:
+        # Archived expenses are read-only, so their rows offer no edit or delete
+        return queryset.values(*ROW_FIELDS, archived=Value(True))
+    return queryset.values(*ROW_FIELDS)
+
+
+def with_labels(rows):
+    for row in rows:
+        row['category_label'] = CATEGORY_LABELS.get(row['category'], row['category'])
+    return rows
+
+
+def _display(row):
+    # Formatted once in Python rather than through per-row template filters
+    created_at = timezone.localtime(row['created_at'])
+    return {
+        **row,
+        'date_short': row['date'].strftime('%b %d'),
+        'date_iso': row['date'].isoformat(),
+        'amount_display': f'{row["amount"]:.2f}',
+        'money_display': money(row['amount'], row['currency']),
+        'home_display': money(row['home_amount'], row['home']) if row.get('home_amount') is not None else '',
+        'created_display': created_at.strftime('%b %d, %Y %H:%M'),
+    }
+
+
+def row_version(row):
+    # Derived from the row's own values, so an edit yields a new key while
+    # writes to other expenses leave this row's cached HTML in place
+    values = '\x1f'.join(str(row[field]) for field in ROW_FIELDS)
+    return hashlib.md5(values.encode()).hexdigest()
+
+
+def _row_key(row, compact):
+    variant = ('compact' if compact else 'full') + ('-archived' if row.get('archived') else '')
+    key = f'expenses:row:{variant}:{row["id"]}:{row_version(row)}'
+    if 'home' in row:
+        # The converted amount can move with the rates while the row stays put
+        key += f':{row["home"]}:{row["home_amount"]}'
+    return key
+
+
+def _in_home(row, home):
+    if home is None or row['currency'] == home:
+        return row
+    return {**row, 'home': home, 'home_amount': rate_cache.convert(row['amount'], row['currency'], home, row['date'])}
+
+
+def render_rows(rows, compact=False, home=None):
+    """Table-row HTML for rows, served from the cache by (expense id, row version).
+
+    One get_many fetches every cached row; only the misses are rendered,
+    through a single compiled template, and stored back with set_many.
+    Rows in a currency other than home also show their amount in home,
+    converted with the process's rate cache rather than a query per row.
+    """
+    rows = [_in_home(row, home) for row in rows]
+    keys = [_row_key(row, compact) for row in rows]
+    cached = cache.get_many(keys)
+    missing = {}
+    template = None
+    for key, row in zip(keys, rows):
+        if key not in cached:
+            template = template or get_template(ROW_TEMPLATE)
+            missing[key] = template.render({'expense': _display(row), 'compact': compact})
+    if missing:
+        cache.set_many(missing, ROW_TIMEOUT)
+        cached.update(missing)
+    return mark_safe(''.join(cached[key] for key in keys))
@@ -0,0 +1,156 @@
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'expenses_expense_fts'
+
+# Contentless FTS5 index over Expense.description, plus an owner column
+# holding 'u<user_id>u', as migration 0018 first installed it. Searches match
+# the owner token too, so FTS5 narrows to one user's rows inside the index.
+# The index is dropped and rebuilt each time, so this repairs whichever
+# earlier version a database has.
+OWNER = "'u' || {row}.user_id || 'u'"
+
+SQLITE_FTS_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        description, owner, content='', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, owner) VALUES (new.id, new.description, {OWNER.format(row='new')});
+    END""",
+    # A contentless index forgets a row given exactly the values it was indexed with
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, owner)
+        VALUES ('delete', old.id, old.description, {OWNER.format(row='old')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF description, user_id ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, owner)
+        VALUES ('delete', old.id, old.description, {OWNER.format(row='old')});
+        INSERT INTO {FTS_TABLE}(rowid, description, owner) VALUES (new.id, new.description, {OWNER.format(row='new')});
+    END""",
+    f"""INSERT INTO {FTS_TABLE}(rowid, description, owner)
+        SELECT id, description, {OWNER.format(row='expenses_expense')} FROM expenses_expense""",
+]
+
+POSTGRES_TRGM_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # icontains compiles to UPPER(description) LIKE UPPER(%s), so index that expression
+    'CREATE INDEX IF NOT EXISTS expense_description_trgm_idx '
+    'ON expenses_expense USING gin (UPPER(description) gin_trgm_ops)',
+]
+
+
+def install_search_index(schema_editor):
+    """Create (or repair) the database search index for the current vendor.
+
+    SQLite drops triggers when Django rebuilds a table, so migrations that
+    remake expenses_expense should call this again afterwards.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+                return
+        statements = SQLITE_FTS_SQL
+    elif vendor == 'postgresql':
+        statements = POSTGRES_TRGM_SQL
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class SearchBackend:
+    """Plain substring search; used when no search index is available.
+
+    user_id, when given, is the owner of every row in queryset; an index
+    can use it to look at that user's rows only.
+    """
+
+    def filter(self, queryset, query, user_id=None):
+        return queryset.filter(description__icontains=query)
+
+    def ranked(self, queryset, query, limit, user_id=None):
+        """Return up to `limit` matches from queryset, best first."""
+        return list(self.filter(queryset, query, user_id)[:limit])
+
+
+class SQLiteFTSBackend(SearchBackend):
+    # Trigram matching needs at least three characters
+    MIN_QUERY_LENGTH = 3
+
+    def match_expression(self, query, user_id=None):
+        # Quote as single FTS5 strings so user input is never parsed as query syntax
+        expression = 'description : "' + query.replace('"', '""') + '"'
+        if user_id is None:
+            return expression
+        return f'owner : "u{int(user_id)}u" AND {expression}'
+
+    def indexed(self, queryset, query):
+        # The index covers the Expense table only; archived rows are scanned
+        return len(query) >= self.MIN_QUERY_LENGTH and queryset.model._meta.db_table == 'expenses_expense'
+
+    def filter(self, queryset, query, user_id=None):
+        if not self.indexed(queryset, query):
+            return super().filter(queryset, query, user_id)
+        matches = RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (self.match_expression(query, user_id),),
+        )
+        return queryset.filter(id__in=matches)
+
+    def ranked(self, queryset, query, limit, user_id=None):
+        if not self.indexed(queryset, query):
+            return super().ranked(queryset, query, limit, user_id)
+        # bm25 ordering and the limit straight from the index, over this
+        # queryset's rows only; the owner column carries no weight
+        rows_sql, rows_params = queryset.order_by().values('id').query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({rows_sql}) '
+                f'ORDER BY bm25({FTS_TABLE}, 1.0, 0.0) LIMIT %s',
+                (self.match_expression(query, user_id), *rows_params, limit),
+            )
+            ranked_ids = [row[0] for row in cursor.fetchall()]
+        expenses = queryset.in_bulk(ranked_ids)
+        return [expenses[pk] for pk in ranked_ids if pk in expenses]
+
+
+class PostgresTrigramBackend(SearchBackend):
+    def ranked(self, queryset, query, limit, user_id=None):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        return list(
+            self.filter(queryset, query, user_id)
+            .annotate(search_rank=TrigramWordSimilarity(query, 'description'))
+            .order_by('-search_rank', '-date', '-created_at')[:limit]
+        )
+
+
+_backends = {}
+
+
+def get_search_backend(using='default'):
+    """Return the search backend for a database alias, detected once per process."""
+    if using not in _backends:
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            _backends[using] = PostgresTrigramBackend()
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backends[using] = SQLiteFTSBackend()
+        else:
+            _backends[using] = SearchBackend()
+    return _backends[using]
+
+
+def search_expenses(queryset, query, user_id=None):
+    return get_search_backend(queryset.db).filter(queryset, query, user_id)
+
+
+def rank_expenses(queryset, query, limit=20, user_id=None):
+    return get_search_backend(queryset.db).ranked(queryset, query, limit, user_id)
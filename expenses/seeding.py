@@ -0,0 +1,78 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import Expense
+from .versioning import bump_version
+
+SEED_PASSWORD = 'seed-password'
+BATCH_SIZE = 5000
+
+# category: (relative frequency, median amount, spread, sample descriptions)
+CATEGORY_PROFILES = {
+    'food': (45, 18, 0.6, ['Groceries', 'Lunch', 'Coffee', 'Dinner out', 'Bakery', 'Takeaway']),
+    'transport': (20, 12, 0.7, ['Bus fare', 'Fuel', 'Train ticket', 'Taxi', 'Parking']),
+    'bills': (10, 85, 0.5, ['Electricity', 'Water', 'Internet', 'Phone plan', 'Rent share']),
+    'shopping': (15, 40, 0.9, ['Clothes', 'Books', 'Electronics', 'Household items', 'Gift']),
+    'other': (10, 25, 1.0, ['Gym', 'Cinema', 'Haircut', 'Donation', '']),
+}
+
+
+def seed_users(count, prefix='seed_user'):
+    """Create (or reuse) count users named prefix_1..prefix_N, all with SEED_PASSWORD."""
+    usernames = [f'{prefix}_{n}' for n in range(1, count + 1)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    password = make_password(SEED_PASSWORD)  # hash once, not once per user
+    User.objects.bulk_create([
+        User(username=username, password=password)
+        for username in usernames if username not in existing
+    ])
+    return list(User.objects.filter(username__in=usernames).order_by('id'))
+
+
+def generate_expenses(user, count, days=365, rng=None, today=None):
+    """Yield count unsaved expenses for user spread over the last `days` days."""
+    rng = rng or random.Random()
+    today = today or timezone.now().date()
+    categories = list(CATEGORY_PROFILES)
+    weights = [profile[0] for profile in CATEGORY_PROFILES.values()]
+    for category in rng.choices(categories, weights, k=count):
+        _, median, spread, descriptions = CATEGORY_PROFILES[category]
+        amount = Decimal(str(round(max(0.5, rng.lognormvariate(0, spread) * median), 2)))
+        yield Expense(
+            user=user,
+            amount=amount,
+            category=category,
+            description=rng.choice(descriptions),
+            date=today - timedelta(days=rng.randrange(days)),
+        )
+
+
+def seed_expenses(users, per_user, days=365, seed=None, batch_size=BATCH_SIZE):
+    """Bulk-insert per_user expenses for each user, keeping rollups and versions in step."""
+    rng = random.Random(seed)
+    created = 0
+    for user in users:
+        batch = []
+        for expense in generate_expenses(user, per_user, days, rng):
+            batch.append(expense)
+            if len(batch) >= batch_size:
+                created += _insert(user, batch)
+                batch = []
+        if batch:
+            created += _insert(user, batch)
+    return created
+
+
+def _insert(user, batch):
+    with transaction.atomic():
+        Expense.objects.bulk_create(batch)
+        rollups.apply_deltas(rollups.deltas_for(batch))
+        bump_version(user.pk)
+    return len(batch)
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Expense, ExpenseTombstone
+from .versioning import note_change, tombstone_written
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted(sender, instance, origin=None, **kwargs):
+    """Leave a tombstone for delta sync when an expense itself is deleted.
+
+    Deletes that cascade from the owner's account leave none; neither do
+    archive moves, which use raw SQL.
+    """
+    if getattr(origin, 'model', type(origin)) is Expense:
+        ExpenseTombstone.objects.create(user_id=instance.user_id, expense_id=instance.pk)
+        tombstone_written()
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def expense_changed(sender, instance, **kwargs):
+    """Bump the owner's data version on any single-row write, admin included."""
+    note_change(instance.user_id)
@@ -1,11 +1,32 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    dashboard, dashboard_stats, expense_list = views.adashboard, views.adashboard_stats, views.aexpense_list
+else:
+    dashboard, dashboard_stats, expense_list = views.dashboard, views.dashboard_stats, views.expense_list
+
 urlpatterns = [
-    path('', views.dashboard, name='dashboard'),
-    path('stats/', views.dashboard_stats, name='dashboard_stats'),
-    path('list/', views.expense_list, name='expense_list'),
+    path('', dashboard, name='dashboard'),
+    path('stats/', dashboard_stats, name='dashboard_stats'),
+    path('stats/events/', views.dashboard_events, name='dashboard_events'),
+    path('list/', expense_list, name='expense_list'),
+    path('list/api/', views.expense_list_api, name='expense_list_api'),
+    path('sync/', views.expense_sync_api, name='expense_sync_api'),
+    path('search/', views.expense_search_api, name='expense_search_api'),
+    path('analytics/', views.expense_analytics, name='expense_analytics'),
+    path('budgets/', views.budget_list, name='budget_list'),
+    path('currency/', views.home_currency, name='home_currency'),
+    path('recurring/', views.recurring_list, name='recurring_list'),
+    path('recurring/<int:pk>/delete/', views.recurring_delete, name='recurring_delete'),
+    path('export/', views.expense_export, name='expense_export'),
+    path('reports/', views.report_request, name='report_request'),
+    path('reports/<int:pk>/', views.report_status, name='report_status'),
+    path('reports/<int:pk>/download/', views.report_download, name='report_download'),
     path('create/', views.expense_create, name='expense_create'),
+    path('import/', views.expense_import, name='expense_import'),
+    path('batch/', views.expense_batch, name='expense_batch'),
     path('<int:pk>/', views.expense_detail, name='expense_detail'),
     path('<int:pk>/edit/', views.expense_update, name='expense_update'),
     path('<int:pk>/delete/', views.expense_delete, name='expense_delete'),
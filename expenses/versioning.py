@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.dispatch import Signal
+
+from .models import DataVersion, Expense, ExpenseTombstone
+
+# Sent with user_id inside the writing transaction whenever a version moves
+version_bumped = Signal()
+
+# Users touched inside the current batched_bumps() block, if any
+_pending = ContextVar('expense_version_pending', default=None)
+
+# Set when a tombstone is written, so only then does the next bump stamp them
+_tombstones_unstamped = ContextVar('expense_tombstones_unstamped', default=False)
+
+
+def get_version(user_id):
+    """Return the user's current data version (0 before their first write)."""
+    version = DataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+    return version or 0
+
+
+async def aget_version(user_id):
+    version = await DataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).afirst()
+    return version or 0
+
+
+def _stamp(**user_filter):
+    """Give rows written in this transaction their owner's new version as change_seq.
+
+    Rows are only unstamped between their write and the bump that follows
+    it, so this finds nothing but the current transaction's writes. The
+    version row stays locked until commit, so one user's change sequences
+    become visible in order, which delta sync relies on.
+    """
+    version = Subquery(DataVersion.objects.filter(user_id=OuterRef('user_id')).values('version')[:1])
+    Expense.objects.filter(change_seq=None, **user_filter).update(change_seq=version)
+    if _tombstones_unstamped.get():
+        ExpenseTombstone.objects.filter(change_seq=None, **user_filter).update(change_seq=version)
+        _tombstones_unstamped.set(False)
+
+
+def tombstone_written():
+    _tombstones_unstamped.set(True)
+
+
+def bump_version(user_id):
+    """Advance the user's data version; call inside the transaction doing the write."""
+    if not DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1):
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(user_id=user_id, version=1)
+        except IntegrityError:
+            DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1)
+    _stamp(user_id=user_id)
+    version_bumped.send(sender=DataVersion, user_id=user_id)
+
+
+def bump_versions(user_ids):
+    """bump_version for many users: one insert and one update in all, plus the stamps.
+
+    Missing version rows are created at 0 first, so every user gets exactly
+    one increment even when a concurrent first write creates the same row.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    DataVersion.objects.bulk_create(
+        [DataVersion(user_id=user_id, version=0) for user_id in user_ids], ignore_conflicts=True,
+    )
+    DataVersion.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+    _stamp(user_id__in=user_ids)
+    for user_id in sorted(user_ids):
+        version_bumped.send(sender=DataVersion, user_id=user_id)
+
+
+def note_change(user_id):
+    """Bump now, or once at the end of the enclosing batched_bumps() block."""
+    pending = _pending.get()
+    if pending is None:
+        bump_version(user_id)
+    else:
+        pending.add(user_id)
+
+
+@contextmanager
+def batched_bumps():
+    """Coalesce per-row bumps from signals during a bulk write into one per user.
+
+    Use inside the write's transaction; nothing is bumped if the block raises.
+    """
+    pending = set()
+    token = _pending.set(pending)
+    try:
+        yield pending
+    finally:
+        _pending.reset(token)
+    for user_id in sorted(pending):
+        bump_version(user_id)
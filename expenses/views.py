@@ -1,104 +1,627 @@
+import asyncio
+import json
+from datetime import date
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
+from django.db import router, transaction
 from django.utils import timezone
-from django.http import JsonResponse
-from datetime import datetime, timedelta
-from .models import Expense
-from .forms import ExpenseForm
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-@login_required(login_url='login')
-def dashboard(request):
-    """Display user dashboard with monthly total and recent expenses."""
-    user_expenses = Expense.objects.filter(user=request.user)
+from config.db_routers import replica_reads
+from .models import ArchivedExpense, Budget, Expense, RecurringExpense, ReportJob
+from .forms import BudgetForm, ExpenseForm, HomeCurrencyForm, RecurringExpenseForm, ReportForm
+from . import archive, caching, currency, insights, recurring, reports, rollups, rows, sync
+from .analytics import AnalyticsError, parse_range, spending_report
+from .batch import BatchError, apply_operations, parse_operations
+from .budgets import budget_status, over_budget
+from .exports import EXPORT_FORMATS, export_stream
+from .importers import IMPORT_FORMATS, guess_format, import_expenses, iter_rows, text_stream
+from .pagination import PAGE_SIZE, InvalidCursor, apaginate, paginate, page_size_from
+from .search import rank_expenses, search_expenses
+from .versioning import aget_version
+
+
+def _expense_json(expense, home=None):
+    row = {field: getattr(expense, field) for field in rows.ROW_FIELDS}
+    row['category_label'] = expense.get_category_display()
+    row['archived'] = isinstance(expense, ArchivedExpense)
+    return _row_json(row, home)
+
+
+def _row_json(row, home=None):
+    converted = None
+    if home is not None and row['currency'] != home:
+        converted = currency.rate_cache.convert(row['amount'], row['currency'], home, row['date'])
+    return {
+        'id': row['id'],
+        'date': row['date'].strftime('%Y-%m-%d'),
+        'category': row['category_label'],
+        'category_code': row['category'],
+        'amount': str(row['amount']),
+        'currency': row['currency'],
+        'amount_display': currency.money(row['amount'], row['currency']),
+        'home_amount_display': currency.money(converted, home) if converted is not None else '',
+        'description': row['description'] if row['description'] else '',
+        'created_at': row['created_at'].strftime('%b %d, %Y %I:%M %p'),
+        'archived': row.get('archived', False),
+    }
+
+
+def _sync_json(row):
+    return {**_row_json(row), 'updated_at': row['updated_at'].isoformat()}
+
+
+def _recent_rows(user):
+    # Only reads the archive for users with fewer than five recent expenses
+    return _page_rows(Expense.objects.filter(user=user), page_size=5, archived=archive.archived_for(user))[0]
+
+
+async def _arecent_rows(user):
+    page, next_cursor = await _apage_rows(Expense.objects.filter(user=user), page_size=5, archived=archive.archived_for(user))
+    return page
+
+
+def _page_rows(user_expenses, cursor=None, page_size=PAGE_SIZE, archived=None):
+    """One keyset page of list rows: values() dicts with category labels."""
+    archived = rows.expense_rows(archived) if archived is not None else None
+    page, next_cursor = paginate(rows.expense_rows(user_expenses), cursor, page_size, archived)
+    return rows.with_labels(page), next_cursor
+
+
+async def _apage_rows(user_expenses, cursor=None, page_size=PAGE_SIZE, archived=None):
+    archived = rows.expense_rows(archived) if archived is not None else None
+    page, next_cursor = await apaginate(rows.expense_rows(user_expenses), cursor, page_size, archived)
+    return rows.with_labels(page), next_cursor
+
+
+def _filter_expenses(request, user, user_expenses):
+    """Apply the list filters from the query string to user's expenses; returns (queryset, filters)."""
+    filters = {}
     
-    # Get current month and year
-    today = timezone.now().date()
-    current_month_start = today.replace(day=1)
+    # Filter by category if provided
+    category = request.GET.get('category')
+    if category:
+        user_expenses = user_expenses.filter(category=category)
+        filters['category'] = category
     
-    # Calculate monthly total
-    monthly_expenses = user_expenses.filter(
-        date__year=today.year,
-        date__month=today.month
-    )
-    monthly_total = monthly_expenses.aggregate(Sum('amount'))['amount__sum'] or 0
+    # Search by description through the database's search index
+    search = request.GET.get('search')
+    if search:
+        user_expenses = search_expenses(user_expenses, search, user.pk)
+        filters['search'] = search
     
-    # Get recent 5 expenses
-    recent_expenses = user_expenses[:5]
+    # Restrict to a date range (inclusive)
+    for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+        value = request.GET.get(param)
+        if not value:
+            continue
+        try:
+            user_expenses = user_expenses.filter(**{lookup: date.fromisoformat(value)})
+        except ValueError:
+            continue
+        filters[param] = value
     
-    context = {
+    return user_expenses, filters
+
+
+def _filtered_expenses(request, user):
+    """(expenses, archived expenses or None, filters) for the list filters.
+
+    The archive is only searched when the date filters reach back past the
+    archive cutoff.
+    """
+    user_expenses, filters = _filter_expenses(request, user, Expense.objects.filter(user=user))
+    date_from = date.fromisoformat(filters['date_from']) if 'date_from' in filters else None
+    archived = None
+    if archive.reaches_archive(date_from):
+        archived, _ = _filter_expenses(request, user, archive.archived_for(user))
+    return user_expenses, archived, filters
+
+
+def _stats_etag_for(user_id, version, today):
+    # Totals only change on a write or when the month rolls over
+    return f'"{user_id}-{version}-{today:%Y%m}"'
+
+
+def _stats_etag(request):
+    return _stats_etag_for(request.user.pk, caching.data_version(request.user.pk), timezone.now().date())
+
+
+def _dashboard_totals(user):
+    today = timezone.now().date()
+    return caching.cached(user.pk, 'totals', lambda: rollups.dashboard_totals(user, today), f'{today:%Y%m}')
+
+
+def _dashboard_insights(user):
+    today = timezone.now().date()
+    # Recomputed nightly by compute_forecasts, so also keyed by the day
+    return caching.cached(user.pk, 'insights', lambda: insights.dashboard_insights(user, today), f'{today}')
+
+
+def _stats_json(monthly_total, expense_count, home):
+    return {
+        'monthly_total': float(monthly_total),
+        'monthly_total_display': currency.money(monthly_total, home),
+        'currency': home,
+        'expense_count': expense_count,
+    }
+
+
+def _currency_context(home):
+    return {
+        'home_currency': home,
+        'currencies': sorted(currency.rate_cache.currencies() | {home}),
+    }
+
+
+def _dashboard_context(monthly_total, expense_count, recent_expenses, rows_html, data_version, spending, home):
+    return {
+        **_currency_context(home),
         'monthly_total': monthly_total,
+        'monthly_total_display': currency.money(monthly_total, home),
+        'projected_display': currency.money(spending['projected'], home) if spending['projected'] is not None else '',
+        'insights': spending,
         'recent_expenses': recent_expenses,
-        'expense_count': user_expenses.count(),
+        'rows_html': rows_html,
+        'expense_count': expense_count,
+        'data_version': data_version,
+        'dashboard_push': settings.DASHBOARD_PUSH,
+    }
+
+
+def _list_context(expenses, next_cursor, filters, rows_html, data_version, home):
+    return {
+        **_currency_context(home),
+        'expenses': expenses,
+        'rows_html': rows_html,
+        'categories': Expense.CATEGORY_CHOICES,
+        'selected_category': filters.get('category'),
+        'search_query': filters.get('search'),
+        'date_from': filters.get('date_from'),
+        'date_to': filters.get('date_to'),
+        'export_query': urlencode(filters),
+        'next_cursor': next_cursor,
+        'data_version': data_version,
+        'next_page_query': urlencode({**filters, 'cursor': next_cursor}) if next_cursor else '',
     }
+
+
+async def _arender(request, user, template_name, context):
+    # Context processors and templates read request.user and the session
+    # synchronously: hand them the user auser() already loaded, and render
+    # on the sync thread rather than the event loop
+    request.user = user
+    return await sync_to_async(render)(request, template_name, context)
+
+@login_required(login_url='login')
+@replica_reads
+def dashboard(request):
+    """Display user dashboard with monthly total and recent expenses."""
+    # Monthly total and expense count come from the maintained rollups
+    monthly_total, expense_count = _dashboard_totals(request.user)
+    
+    # Get recent 5 expenses
+    recent_expenses = caching.cached(request.user.pk, 'recent', lambda: _recent_rows(request.user))
+    home = currency.home_currency(request.user.pk)
+    
+    context = _dashboard_context(
+        monthly_total, expense_count, recent_expenses,
+        rows.render_rows(recent_expenses, compact=True, home=home), caching.data_version(request.user.pk),
+        _dashboard_insights(request.user), home,
+    )
     return render(request, 'expenses/dashboard.html', context)
 
 @login_required(login_url='login')
+@replica_reads
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_stats_etag)
 def dashboard_stats(request):
     """API endpoint to get updated dashboard stats."""
-    user_expenses = Expense.objects.filter(user=request.user)
+    monthly_total, expense_count = _dashboard_totals(request.user)
+    
+    return JsonResponse(_stats_json(monthly_total, expense_count, currency.home_currency(request.user.pk)))
+
+@login_required(login_url='login')
+async def dashboard_events(request):
+    """Server-Sent Events stream that pushes new dashboard stats after a write.
+
+    Only checks the user's data version between pushes, so idle tabs never
+    touch the Expense table. Needs an ASGI server (see config/asgi.py).
+    """
+    if not settings.DASHBOARD_PUSH:
+        raise Http404('Dashboard push is disabled.')
+
+    user = await request.auser()
+    last_seen = request.headers.get('Last-Event-ID') or request.GET.get('version')
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.DASHBOARD_PUSH_TIMEOUT
+        version = int(last_seen) if last_seen and last_seen.isdigit() else None
+        yield f'retry: {int(settings.DASHBOARD_PUSH_INTERVAL * 1000)}\n\n'
+        while loop.time() < deadline:
+            current = await aget_version(user.pk)
+            if current != version:
+                version = current
+                monthly_total, expense_count = await rollups.adashboard_totals(user, timezone.now().date())
+                data = json.dumps(_stats_json(monthly_total, expense_count, await currency.ahome_currency(user.pk)))
+                yield f'id: {version}\nevent: stats\ndata: {data}\n\n'
+            else:
+                yield ': keep-alive\n\n'
+            await asyncio.sleep(settings.DASHBOARD_PUSH_INTERVAL)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required(login_url='login')
+@replica_reads
+def expense_list(request):
+    """Display user expenses a page at a time with filtering by category."""
+    user_expenses, archived, filters = _filtered_expenses(request, request.user)
+    cursor = request.GET.get('cursor') or ''
     
-    # Get current month and year
+    try:
+        expenses, next_cursor = caching.cached(
+            request.user.pk, 'list', lambda: _page_rows(user_expenses, cursor, archived=archived), filters, cursor,
+        )
+    except InvalidCursor:
+        expenses, next_cursor = _page_rows(user_expenses, archived=archived)
+    
+    home = currency.home_currency(request.user.pk)
+    context = _list_context(
+        expenses, next_cursor, filters, rows.render_rows(expenses, home=home), caching.data_version(request.user.pk), home,
+    )
+    return render(request, 'expenses/expense_list.html', context)
+
+# Async versions of the read-heavy views, routed instead of the sync ones
+# when ASYNC_VIEWS is on (see config/asgi.py). They share cache entries
+# with the sync views.
+
+@login_required(login_url='login')
+@replica_reads
+async def adashboard(request):
+    """Async dashboard."""
+    user = await request.auser()
     today = timezone.now().date()
+    version = await caching.adata_version(user.pk)
     
-    # Calculate monthly total
-    monthly_expenses = user_expenses.filter(
-        date__year=today.year,
-        date__month=today.month
+    (monthly_total, expense_count), recent_expenses, spending = await asyncio.gather(
+        caching.acached(
+            user.pk, 'totals', lambda: rollups.adashboard_totals(user, today), f'{today:%Y%m}', version=version,
+        ),
+        caching.acached(
+            user.pk, 'recent', lambda: _arecent_rows(user), version=version,
+        ),
+        caching.acached(
+            user.pk, 'insights', lambda: insights.adashboard_insights(user, today), f'{today}', version=version,
+        ),
     )
-    monthly_total = monthly_expenses.aggregate(Sum('amount'))['amount__sum'] or 0
     
+    home = await currency.ahome_currency(user.pk)
+    rows_html = await sync_to_async(rows.render_rows)(recent_expenses, compact=True, home=home)
+    context = await sync_to_async(_dashboard_context)(
+        monthly_total, expense_count, recent_expenses, rows_html, version, spending, home,
+    )
+    return await _arender(request, user, 'expenses/dashboard.html', context)
+
+@login_required(login_url='login')
+@replica_reads
+@cache_control(private=True, no_cache=True)
+async def adashboard_stats(request):
+    """Async dashboard stats; answers 304 while the data version is unchanged."""
+    user = await request.auser()
+    today = timezone.now().date()
+    version = await caching.adata_version(user.pk)
+    etag = _stats_etag_for(user.pk, version, today)
+    
+    # condition() computes ETags synchronously, so check them here instead
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        monthly_total, expense_count = await caching.acached(
+            user.pk, 'totals', lambda: rollups.adashboard_totals(user, today), f'{today:%Y%m}', version=version,
+        )
+        response = JsonResponse(_stats_json(monthly_total, expense_count, await currency.ahome_currency(user.pk)))
+    response.headers.setdefault('ETag', etag)
+    return response
+
+@login_required(login_url='login')
+@replica_reads
+async def aexpense_list(request):
+    """Async expense list."""
+    user = await request.auser()
+    # Building the filters may look up the search backend on first use
+    user_expenses, archived, filters = await sync_to_async(_filtered_expenses)(request, user)
+    cursor = request.GET.get('cursor') or ''
+    version = await caching.adata_version(user.pk)
+    
+    try:
+        expenses, next_cursor = await caching.acached(
+            user.pk, 'list', lambda: _apage_rows(user_expenses, cursor, archived=archived), filters, cursor, version=version,
+        )
+    except InvalidCursor:
+        expenses, next_cursor = await _apage_rows(user_expenses, archived=archived)
+    
+    home = await currency.ahome_currency(user.pk)
+    rows_html = await sync_to_async(rows.render_rows)(expenses, home=home)
+    context = await sync_to_async(_list_context)(expenses, next_cursor, filters, rows_html, version, home)
+    return await _arender(request, user, 'expenses/expense_list.html', context)
+
+@login_required(login_url='login')
+@replica_reads
+def expense_list_api(request):
+    """API endpoint returning one page of expenses for infinite scroll."""
+    user_expenses, archived, filters = _filtered_expenses(request, request.user)
+    
+    try:
+        expenses, next_cursor = _page_rows(user_expenses, request.GET.get('cursor'), page_size_from(request), archived)
+    except InvalidCursor as exc:
+        return JsonResponse({'status': 'error', 'errors': {'cursor': [str(exc)]}}, status=400)
+    
+    home = currency.home_currency(request.user.pk)
     return JsonResponse({
-        'monthly_total': float(monthly_total),
-        'expense_count': user_expenses.count(),
+        'status': 'success',
+        'expenses': [_row_json(row, home) for row in expenses],
+        'next_cursor': next_cursor,
     })
 
 @login_required(login_url='login')
-def expense_list(request):
-    """Display all user expenses with filtering by category."""
-    user_expenses = Expense.objects.filter(user=request.user)
+@replica_reads
+def expense_sync_api(request):
+    """API endpoint returning the expenses created, changed or deleted since a sync token."""
+    try:
+        changes, token, more = sync.changes_since(
+            request.user, request.GET.get('token'), page_size_from(request, sync.PAGE_SIZE, sync.MAX_PAGE_SIZE),
+        )
+    except sync.InvalidToken as exc:
+        # An expired token may have missed compacted deletes; the client starts over
+        status = 410 if isinstance(exc, sync.ExpiredToken) else 400
+        return JsonResponse({'status': 'error', 'errors': {'token': [str(exc)]}}, status=status)
     
-    # Filter by category if provided
+    return JsonResponse({
+        'status': 'success',
+        'expenses': [_sync_json(row) for row in rows.with_labels([c for c in changes if not c.get('deleted')])],
+        'deleted': [change['id'] for change in changes if change.get('deleted')],
+        'token': token,
+        'more': more,
+    })
+
+@login_required(login_url='login')
+@replica_reads
+def expense_export(request):
+    """Stream the user's expenses, filtered like expense_list, as CSV, NDJSON or XLSX."""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'errors': {'format': [f'Choose one of: {", ".join(EXPORT_FORMATS)}.']}}, status=400)
+    
+    user_expenses, archived, filters = _filtered_expenses(request, request.user)
+    # Rows are read while the response streams, after replica_reads has
+    # returned, so pin them to the database chosen for this request
+    using = router.db_for_read(Expense)
+    user_expenses = user_expenses.using(using)
+    archived = archived.using(using) if archived is not None else None
+    
+    response = StreamingHttpResponse(export_stream(user_expenses, fmt, archived), content_type=EXPORT_FORMATS[fmt])
+    filename = f'expenses-{timezone.now():%Y%m%d}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _report_json(job):
+    done = job.status == ReportJob.DONE
+    return {
+        'id': job.id,
+        'period': job.period,
+        'start': job.start.strftime('%Y-%m-%d'),
+        'format': job.format,
+        'state': job.status,
+        'error': job.error or None,
+        'status_url': reverse('report_status', args=[job.id]),
+        'download_url': reverse('report_download', args=[job.id]) if done else None,
+    }
+
+@login_required(login_url='login')
+def report_request(request):
+    """API endpoint asking for a monthly or yearly statement.
+
+    Answers 200 with a download URL when the statement is cached for the
+    user's current data, otherwise 202 while run_report_workers builds it.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'errors': {'__all__': ['POST to request a statement.']}}, status=405)
+    
+    form = ReportForm(request.POST)
+    if not form.is_valid():
+        errors = {field: [str(error) for error in field_errors] for field, field_errors in form.errors.items()}
+        return JsonResponse({'status': 'error', 'errors': errors}, status=400)
+    
+    job = reports.request_report(request.user, form.cleaned_data['period'], form.cleaned_data['date'], form.cleaned_data['format'])
+    return JsonResponse({'status': 'success', 'report': _report_json(job)}, status=200 if job.status == ReportJob.DONE else 202)
+
+@login_required(login_url='login')
+def report_status(request, pk):
+    """API endpoint polled while a statement is being built."""
+    # Always the primary: a lagging replica would hold back the worker's progress
+    job = get_object_or_404(ReportJob, pk=pk, user=request.user)
+    return JsonResponse({'status': 'success', 'report': _report_json(job)})
+
+@login_required(login_url='login')
+def report_download(request, pk):
+    """Serve a finished statement from the report cache."""
+    job = get_object_or_404(ReportJob, pk=pk, user=request.user, status=ReportJob.DONE)
+    try:
+        handle = reports.report_path(job, job.data_version).open('rb')
+    except FileNotFoundError:
+        return JsonResponse({'status': 'error', 'errors': {'__all__': ['This statement is no longer cached; request it again.']}}, status=410)
+    
+    period = f'{job.start:%Y}' if job.period == ReportJob.YEAR else f'{job.start:%Y-%m}'
+    # The HTML statement opens in the browser, ready to print
+    return FileResponse(
+        handle, as_attachment=job.format != ReportJob.HTML,
+        filename=f'statement-{period}.{job.format}', content_type=reports.REPORT_FORMATS[job.format],
+    )
+
+@login_required(login_url='login')
+@replica_reads
+def expense_search_api(request):
+    """API endpoint returning the best description matches for a query."""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'status': 'error', 'errors': {'q': ['This field is required.']}}, status=400)
+    
+    user_expenses = Expense.objects.filter(user=request.user)
+    archived = archive.archived_for(request.user)
     category = request.GET.get('category')
     if category:
         user_expenses = user_expenses.filter(category=category)
+        archived = archived.filter(category=category)
     
-    # Search by description
-    search = request.GET.get('search')
-    if search:
-        user_expenses = user_expenses.filter(description__icontains=search)
+    limit = page_size_from(request)
+    expenses = rank_expenses(user_expenses, query, limit, request.user.pk)
+    # Archived matches only fill up a short result
+    if len(expenses) < limit:
+        expenses += rank_expenses(archived, query, limit - len(expenses), request.user.pk)
+    return JsonResponse({
+        'status': 'success',
+        'expenses': [_expense_json(expense) for expense in expenses],
+    })
+
+@login_required(login_url='login')
+@replica_reads
+def expense_analytics(request):
+    """API endpoint returning category breakdowns and a spending time series."""
+    try:
+        start, end, granularity, window = parse_range(request.GET, timezone.now().date())
+    except AnalyticsError as exc:
+        return JsonResponse({'status': 'error', 'errors': {'__all__': [str(exc)]}}, status=400)
     
-    context = {
-        'expenses': user_expenses,
-        'categories': Expense.CATEGORY_CHOICES,
-        'selected_category': category,
-        'search_query': search,
+    report = caching.cached(
+        request.user.pk, 'analytics',
+        lambda: spending_report(request.user, start, end, granularity, window),
+        start, end, granularity, window,
+    )
+    return JsonResponse({'status': 'success', **report})
+
+@login_required(login_url='login')
+def budget_list(request):
+    """API endpoint listing monthly category budgets (GET) or setting one (POST).
+
+    POST category and amount to set a budget; a blank amount removes it.
+    """
+    if request.method == 'POST':
+        if not request.POST.get('amount'):
+            Budget.objects.filter(user=request.user, category=request.POST.get('category')).delete()
+        else:
+            form = BudgetForm(request.POST)
+            if not form.is_valid():
+                errors = {field: [str(error) for error in field_errors] for field, field_errors in form.errors.items()}
+                return JsonResponse({'status': 'error', 'errors': errors}, status=400)
+            # An upsert, so two requests creating the same budget at once both succeed
+            Budget.objects.update_or_create(
+                user=request.user, category=form.cleaned_data['category'],
+                defaults={'amount': form.cleaned_data['amount']},
+            )
+    
+    today = timezone.now().date()
+    return JsonResponse({
+        'status': 'success',
+        'month': f'{today:%Y-%m}',
+        'budgets': budget_status(request.user, today),
+    })
+
+@login_required(login_url='login')
+def home_currency(request):
+    """API endpoint showing (GET) or changing (POST) the currency totals are kept in.
+
+    A change re-prices the user's rollups, so budgets now count in the new
+    currency too; their amounts are left as they are.
+    """
+    if request.method == 'POST':
+        form = HomeCurrencyForm(request.POST)
+        if not form.is_valid():
+            errors = {field: [str(error) for error in field_errors] for field, field_errors in form.errors.items()}
+            return JsonResponse({'status': 'error', 'errors': errors}, status=400)
+        rollups.change_home_currency(request.user, form.cleaned_data['currency'])
+    
+    return JsonResponse({
+        'status': 'success',
+        'currency': currency.home_currency(request.user.pk),
+        'currencies': sorted(currency.rate_cache.currencies()),
+    })
+
+def _recurring_json(rule):
+    return {
+        'id': rule.id,
+        'amount': str(rule.amount),
+        'currency': rule.currency,
+        'category': rule.get_category_display(),
+        'category_code': rule.category,
+        'description': rule.description,
+        'frequency': rule.frequency,
+        'interval': rule.interval,
+        'by_weekday': rule.by_weekday,
+        'start_date': rule.start_date.strftime('%Y-%m-%d'),
+        'end_date': rule.end_date.strftime('%Y-%m-%d') if rule.end_date else None,
+        'next_date': rule.next_date.strftime('%Y-%m-%d'),
+        'active': rule.active,
     }
-    return render(request, 'expenses/expense_list.html', context)
+
+@login_required(login_url='login')
+def recurring_list(request):
+    """API endpoint listing recurring expense rules (GET) or adding one (POST).
+
+    Expenses are generated from the rules by the materialize_recurring command.
+    """
+    if request.method == 'POST':
+        form = RecurringExpenseForm(request.POST, home=currency.home_currency(request.user.pk))
+        if not form.is_valid():
+            errors = {field: [str(error) for error in field_errors] for field, field_errors in form.errors.items()}
+            return JsonResponse({'status': 'error', 'errors': errors}, status=400)
+        rule = form.save(commit=False)
+        rule.user = request.user
+        rule.next_date = recurring.first(rule)
+        rule.save()
+        return JsonResponse({'status': 'success', 'rule': _recurring_json(rule)})
+    
+    rules = RecurringExpense.objects.filter(user=request.user)
+    return JsonResponse({'status': 'success', 'rules': [_recurring_json(rule) for rule in rules]})
+
+@login_required(login_url='login')
+def recurring_delete(request, pk):
+    """API endpoint deleting a recurring rule; expenses it already created are kept."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'errors': {'__all__': ['POST to delete a rule.']}}, status=405)
+    rule = get_object_or_404(RecurringExpense, pk=pk, user=request.user)
+    rule.delete()
+    return JsonResponse({'status': 'success', 'rule_id': pk})
 
 @login_required(login_url='login')
 def expense_create(request):
     """Create a new expense."""
+    home = currency.home_currency(request.user.pk)
     if request.method == 'POST':
-        form = ExpenseForm(request.POST)
+        form = ExpenseForm(request.POST, home=home)
         if form.is_valid():
             expense = form.save(commit=False)
             expense.user = request.user
-            expense.save()
+            with transaction.atomic():
+                expense.save()
+                rollups.record_created(expense)
             
             # Check if AJAX request
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
                     'status': 'success',
-                    'expense': {
-                        'id': expense.id,
-                        'date': expense.date.strftime('%Y-%m-%d'),
-                        'category': expense.get_category_display(),
-                        'category_code': expense.category,
-                        'amount': str(expense.amount),
-                        'description': expense.description if expense.description else '',
-                        'created_at': expense.created_at.strftime('%b %d, %Y %I:%M %p'),
-                    }
+                    'expense': _expense_json(expense, home),
+                    'warnings': over_budget(expense),
                 })
             return redirect('expense_list')
         else:
@@ -113,40 +636,97 @@ def expense_create(request):
                     'errors': errors
                 }, status=400)
     else:
-        form = ExpenseForm()
+        form = ExpenseForm(home=home)
     
     context = {'form': form, 'title': 'Add Expense'}
     return render(request, 'expenses/expense_form.html', context)
 
 @login_required(login_url='login')
+def expense_import(request):
+    """API endpoint to bulk import expenses from an uploaded CSV or NDJSON file."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'errors': {'__all__': ['POST a file to import.']}}, status=405)
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'status': 'error', 'errors': {'file': ['This field is required.']}}, status=400)
+    
+    fmt = request.POST.get('format') or guess_format(upload.name)
+    if fmt not in IMPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'errors': {'format': [f'Choose one of: {", ".join(IMPORT_FORMATS)}.']}}, status=400)
+    
+    # Rows are parsed and inserted as they are read, never all at once
+    result = import_expenses(request.user, iter_rows(text_stream(upload.file), fmt))
+    return JsonResponse({'status': 'success', **result.as_dict()})
+
+@login_required(login_url='login')
+def expense_batch(request):
+    """API endpoint applying many create/update/delete operations in one transaction."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'errors': {'__all__': ['POST a JSON list of operations.']}}, status=405)
+    
+    try:
+        operations = parse_operations(json.loads(request.body))
+    except (ValueError, BatchError) as exc:
+        message = str(exc) if isinstance(exc, BatchError) else 'Request body must be valid JSON.'
+        return JsonResponse({'status': 'error', 'errors': {'__all__': [message]}}, status=400)
+    
+    applied = apply_operations(request.user, operations)
+    
+    # Each result matches what the single-expense views return
+    results = []
+    for operation in operations:
+        if operation.errors:
+            results.append({'status': 'error', 'errors': operation.errors})
+        elif not applied:
+            results.append({'status': 'skipped'})
+        elif operation.op == 'delete':
+            results.append({
+                'status': 'success',
+                'message': 'Expense deleted successfully',
+                'expense_id': operation.expense_id,
+            })
+        else:
+            results.append({'status': 'success', 'expense': _expense_json(operation.expense)})
+    
+    return JsonResponse({
+        'status': 'success' if applied else 'error',
+        'results': results,
+    }, status=200 if applied else 400)
+
+@login_required(login_url='login')
+@replica_reads
 def expense_detail(request, pk):
     """Display expense detail."""
-    expense = get_object_or_404(Expense, pk=pk, user=request.user)
+    expense = caching.cached(
+        request.user.pk, 'expense', lambda: Expense.objects.filter(pk=pk, user=request.user).first(), pk,
+    )
+    if expense is None:
+        raise Http404('No Expense matches the given query.')
     return render(request, 'expenses/expense_detail.html', {'expense': expense})
 
 @login_required(login_url='login')
 def expense_update(request, pk):
     """Update an existing expense."""
-    expense = get_object_or_404(Expense, pk=pk, user=request.user)
-    
     if request.method == 'POST':
-        form = ExpenseForm(request.POST, instance=expense)
-        if form.is_valid():
-            form.save()
-            
+        with transaction.atomic():
+            # Locked until commit, so concurrent edits each snapshot what the previous one saved
+            expense = get_object_or_404(Expense.objects.select_for_update(), pk=pk, user=request.user)
+            # Validation writes the posted values onto the instance, so capture the old bucket first
+            previous = rollups.snapshot(expense)
+            form = ExpenseForm(request.POST, instance=expense)
+            saved = form.is_valid()
+            if saved:
+                form.save()
+                rollups.record_updated(previous, expense)
+        
+        if saved:
             # Check if AJAX request
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
                     'status': 'success',
-                    'expense': {
-                        'id': expense.id,
-                        'date': expense.date.strftime('%Y-%m-%d'),
-                        'category': expense.get_category_display(),
-                        'category_code': expense.category,
-                        'amount': str(expense.amount),
-                        'description': expense.description if expense.description else '',
-                        'created_at': expense.created_at.strftime('%b %d, %Y %I:%M %p'),
-                    }
+                    'expense': _expense_json(expense, currency.home_currency(request.user.pk)),
+                    'warnings': over_budget(expense),
                 })
             return redirect('expense_list')
         else:
@@ -161,6 +741,7 @@ def expense_update(request, pk):
                     'errors': errors
                 }, status=400)
     else:
+        expense = get_object_or_404(Expense, pk=pk, user=request.user)
         form = ExpenseForm(instance=expense)
     
     context = {'form': form, 'expense': expense, 'title': 'Edit Expense'}
@@ -169,11 +750,13 @@ def expense_update(request, pk):
 @login_required(login_url='login')
 def expense_delete(request, pk):
     """Delete an expense."""
-    expense = get_object_or_404(Expense, pk=pk, user=request.user)
-    
     if request.method == 'POST':
-        expense_id = expense.id
-        expense.delete()
+        with transaction.atomic():
+            # Locked until commit, so the rollups lose the row as it is now, and only once
+            expense = get_object_or_404(Expense.objects.select_for_update(), pk=pk, user=request.user)
+            expense_id = expense.id
+            rollups.record_deleted(expense)
+            expense.delete()
         
         # Check if AJAX request
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -184,4 +767,5 @@ def expense_delete(request, pk):
             })
         return redirect('expense_list')
     
+    expense = get_object_or_404(Expense, pk=pk, user=request.user)
     return render(request, 'expenses/expense_confirm_delete.html', {'expense': expense})
@@ -0,0 +1,52 @@
+// Live stats and the category filter for the dashboard; expenses.js handles the rest.
+const dashboardConfig = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function() {
+    function renderStats(data) {
+        document.getElementById('monthlyTotalAmount').textContent = data.monthly_total_display;
+        document.getElementById('expenseCountAmount').textContent = data.expense_count;
+    }
+    
+    // Refresh monthly total and expense count; unchanged stats come back as 304
+    let statsETag = null;
+    function updateStats() {
+        const headers = {'X-Requested-With': 'XMLHttpRequest'};
+        if (statsETag) headers['If-None-Match'] = statsETag;
+        fetch(dashboardConfig.statsUrl, {method: 'GET', headers: headers, cache: 'no-store'})
+        .then(r => {
+            if (r.status === 304) return null;
+            statsETag = r.headers.get('ETag');
+            return r.json();
+        })
+        .then(data => { if (data) renderStats(data); })
+        .catch(e => console.error('Error fetching stats:', e));
+    }
+    
+    if (dashboardConfig.eventsUrl) {
+        // Stats are pushed by the server after each write
+        const statsSource = new EventSource(dashboardConfig.eventsUrl);
+        statsSource.addEventListener('stats', e => renderStats(JSON.parse(e.data)));
+    } else {
+        // Poll stats every 5 seconds
+        setInterval(updateStats, 5000);
+    }
+    document.addEventListener('expenses:changed', updateStats);
+    
+    // Category filter
+    document.getElementById('categoryFilter')?.addEventListener('change', function() {
+        const category = this.value;
+        const tbody = document.querySelector('tbody');
+        if (!tbody) return;
+        
+        const rows = tbody.querySelectorAll('tr');
+        rows.forEach(row => {
+            if (category === '') {
+                row.style.display = '';
+            } else {
+                const badge = row.querySelector('.badge');
+                const rowCategory = badge ? badge.textContent.toLowerCase() : '';
+                row.style.display = rowCategory.includes(category) ? '' : 'none';
+            }
+        });
+    });
+});
@@ -0,0 +1,44 @@
+// Infinite scroll for the expense list; expenses.js handles the modals and writes.
+const listConfig = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Fetch the next page when the "Load more" button comes into view
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    let loadingMore = false;
+    function loadMore() {
+        if (loadingMore || !loadMoreBtn.dataset.cursor) return;
+        loadingMore = true;
+        const params = new URLSearchParams(window.location.search);
+        params.set('cursor', loadMoreBtn.dataset.cursor);
+        
+        fetch(`${listConfig.apiUrl}?${params}`, {
+            method: 'GET',
+            headers: {'X-Requested-With': 'XMLHttpRequest'}
+        })
+        .then(r => r.json())
+        .then(data => {
+            if (data.status === 'success') {
+                data.expenses.forEach(addTableRow);
+                if (data.next_cursor) {
+                    loadMoreBtn.dataset.cursor = data.next_cursor;
+                } else {
+                    loadMoreBtn.remove();
+                }
+            }
+        })
+        .catch(e => showToast('Error loading expenses', 'error'))
+        .finally(() => { loadingMore = false; });
+    }
+    
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', function(e) {
+            e.preventDefault();
+            loadMore();
+        });
+        if ('IntersectionObserver' in window) {
+            new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) loadMore();
+            }).observe(loadMoreBtn);
+        }
+    }
+});
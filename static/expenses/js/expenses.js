@@ -0,0 +1,211 @@
+// Modal, fetch and table-row handling shared by the dashboard and the expense list.
+// The page passes its URLs on this script's tag; after every successful write
+// an 'expenses:changed' event is dispatched on the document.
+const expenseUrls = document.currentScript.dataset;
+
+function getCSRFToken() {
+    return document.querySelector('[name="csrfmiddlewaretoken"]')?.value || '';
+}
+
+function expenseUrl(template, id) {
+    return template.replace('99999', id);
+}
+
+// Amount cell contents: the amount, and below it the home-currency figure for other currencies
+function amountCell(expense) {
+    const converted = expense.home_amount_display ? `<small class="d-block text-muted">&asymp; ${expense.home_amount_display}</small>` : '';
+    return `<strong>${expense.amount_display}</strong>${converted}`;
+}
+
+// Update expense in existing table row (update cell values only)
+function updateTableRow(expense) {
+    const row = document.querySelector(`tr[data-expense-id="${expense.id}"]`);
+    if (!row) return;
+    
+    const cells = row.querySelectorAll('td');
+    // Date cell
+    cells[0].innerHTML = `<small class="d-md-auto">${new Date(expense.date).toLocaleDateString('en-US', { month: 'short', day: 'numeric' })}</small>`;
+    // Category cell
+    cells[1].innerHTML = `<span class="badge bg-primary">${expense.category}</span>`;
+    // Description cell (hidden on mobile)
+    const desc = expense.description || '—';
+    cells[2].innerHTML = `<small>${desc.length > 25 ? desc.substring(0, 25) + '...' : desc}</small>`;
+    // Amount cell
+    cells[3].innerHTML = amountCell(expense);
+}
+
+// Add new expense row to table
+function addTableRow(expense) {
+    const tbody = document.querySelector('tbody');
+    if (!tbody) return;
+    
+    const row = document.createElement('tr');
+    row.setAttribute('data-expense-id', expense.id);
+    row.innerHTML = `
+        <td><small class="d-md-auto">${new Date(expense.date).toLocaleDateString('en-US', { month: 'short', day: 'numeric' })}</small></td>
+        <td><span class="badge bg-primary">${expense.category}</span></td>
+        <td class="d-none d-md-table-cell"><small>${expense.description || '—'}</small></td>
+        <td>${amountCell(expense)}</td>
+        <td>
+            <div class="btn-group btn-group-sm" role="group">
+                <button type="button" class="btn btn-info view-expense-btn" data-bs-toggle="modal" data-bs-target="#viewExpenseModal"
+                    data-id="${expense.id}" data-date="${expense.date}" data-category="${expense.category}" data-category-code="${expense.category_code}"
+                    data-amount="${expense.amount}" data-money="${expense.amount_display}" data-description="${expense.description}" data-created="${expense.created_at}">View</button>
+                ${expense.archived ? '' : `<button type="button" class="btn btn-warning edit-expense-btn" data-bs-toggle="modal" data-bs-target="#editExpenseModal"
+                    data-id="${expense.id}" data-date="${expense.date}" data-category="${expense.category_code}"
+                    data-amount="${expense.amount}" data-currency="${expense.currency}" data-description="${expense.description}">Edit</button>
+                <button type="button" class="btn btn-danger delete-expense-btn" data-bs-toggle="modal" data-bs-target="#deleteExpenseModal"
+                    data-id="${expense.id}" data-category="${expense.category}" data-amount="${expense.amount_display}"
+                    data-description="${expense.description}" data-date="${expense.date}">Delete</button>`}
+            </div>
+        </td>
+    `;
+    tbody.appendChild(row);
+}
+
+function postExpense(url, formData) {
+    formData.append('csrfmiddlewaretoken', getCSRFToken());
+    return fetch(url, {
+        method: 'POST',
+        body: formData,
+        headers: {'X-Requested-With': 'XMLHttpRequest', 'X-CSRFToken': getCSRFToken()}
+    })
+    .then(r => r.json());
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    let currentExpenseId = null;
+    
+    function expensesChanged() {
+        document.dispatchEvent(new CustomEvent('expenses:changed'));
+    }
+    
+    // Modal data handlers
+    document.getElementById('viewExpenseModal')?.addEventListener('show.bs.modal', function(event) {
+        const btn = event.relatedTarget;
+        document.getElementById('viewDate').textContent = btn.dataset.date;
+        document.getElementById('viewCategory').innerHTML = `<span class="badge bg-primary">${btn.dataset.category}</span>`;
+        document.getElementById('viewAmount').textContent = btn.dataset.money;
+        document.getElementById('viewDescription').textContent = btn.dataset.description || '—';
+        document.getElementById('viewCreated').textContent = btn.dataset.created;
+    });
+
+    document.getElementById('editExpenseModal')?.addEventListener('show.bs.modal', function(event) {
+        const btn = event.relatedTarget;
+        currentExpenseId = btn.dataset.id;
+        document.getElementById('editDate').value = btn.dataset.date;
+        document.getElementById('editCategory').value = btn.dataset.category;
+        document.getElementById('editAmount').value = btn.dataset.amount;
+        // The currency picker is only there once rates for other currencies are loaded
+        const currency = document.getElementById('editCurrency');
+        if (currency) currency.value = btn.dataset.currency;
+        document.getElementById('editDescription').value = btn.dataset.description || '';
+    });
+
+    document.getElementById('deleteExpenseModal')?.addEventListener('show.bs.modal', function(event) {
+        const btn = event.relatedTarget;
+        currentExpenseId = btn.dataset.id;
+        document.getElementById('deleteCategory').textContent = btn.dataset.category;
+        document.getElementById('deleteAmount').textContent = btn.dataset.amount;
+        document.getElementById('deleteDescription').textContent = btn.dataset.description || '(No description)';
+        document.getElementById('deleteDate').textContent = btn.dataset.date;
+    });
+
+    // Add Expense
+    document.getElementById('addExpenseBtn')?.addEventListener('click', function() {
+        const form = document.getElementById('addExpenseForm');
+        
+        postExpense(form.action, new FormData(form))
+        .then(data => {
+            if (data.status === 'success') {
+                const tbody = document.querySelector('tbody');
+                if (!tbody) {
+                    // Create table if it doesn't exist
+                    const empty = document.getElementById('expensesEmpty');
+                    if (empty) {
+                        empty.outerHTML = `<div class="table-responsive"><table class="table table-hover mb-0"><thead><tr><th>Date</th><th>Category</th><th class="d-none d-md-table-cell">Description</th><th>Amount</th><th>Actions</th></tr></thead><tbody></tbody></table></div>`;
+                    }
+                }
+                addTableRow(data.expense);
+                form.reset();
+                document.getElementById('addDate').value = new Date().toISOString().split('T')[0];
+                bootstrap.Modal.getInstance(document.getElementById('addExpenseModal')).hide();
+                showToast('Expense added!', 'success');
+                (data.warnings || []).forEach(w => showToast(w.message, 'warning'));
+                expensesChanged();
+            }
+        })
+        .catch(e => showToast('Error adding expense', 'error'));
+    });
+
+    // Edit Expense
+    document.getElementById('editSaveBtn')?.addEventListener('click', function() {
+        const form = document.getElementById('editExpenseForm');
+        
+        postExpense(expenseUrl(expenseUrls.updateUrl, currentExpenseId), new FormData(form))
+        .then(data => {
+            if (data.status === 'success') {
+                const exp = data.expense;
+                updateTableRow(exp);
+                
+                // Update the button data attributes too
+                const row = document.querySelector(`tr[data-expense-id="${exp.id}"]`);
+                const viewBtn = row.querySelector('.view-expense-btn');
+                const editBtn = row.querySelector('.edit-expense-btn');
+                const deleteBtn = row.querySelector('.delete-expense-btn');
+                
+                viewBtn.dataset.date = exp.date;
+                viewBtn.dataset.category = exp.category;
+                viewBtn.dataset.amount = exp.amount;
+                viewBtn.dataset.money = exp.amount_display;
+                viewBtn.dataset.description = exp.description;
+                
+                editBtn.dataset.date = exp.date;
+                editBtn.dataset.category = exp.category_code;
+                editBtn.dataset.amount = exp.amount;
+                editBtn.dataset.currency = exp.currency;
+                editBtn.dataset.description = exp.description;
+                
+                deleteBtn.dataset.category = exp.category;
+                deleteBtn.dataset.amount = exp.amount_display;
+                deleteBtn.dataset.description = exp.description;
+                deleteBtn.dataset.date = exp.date;
+                
+                bootstrap.Modal.getInstance(document.getElementById('editExpenseModal')).hide();
+                showToast('Expense updated!', 'success');
+                (data.warnings || []).forEach(w => showToast(w.message, 'warning'));
+                expensesChanged();
+            }
+        })
+        .catch(e => showToast('Error updating expense', 'error'));
+    });
+
+    // Delete Expense
+    document.getElementById('deleteConfirmBtn')?.addEventListener('click', function(e) {
+        e.preventDefault();
+        
+        postExpense(expenseUrl(expenseUrls.deleteUrl, currentExpenseId), new FormData())
+        .then(data => {
+            if (data.status === 'success') {
+                const row = document.querySelector(`tr[data-expense-id="${data.expense_id}"]`);
+                if (row) row.remove();
+                
+                const tbody = document.querySelector('tbody');
+                if (!tbody || tbody.children.length === 0) {
+                    const table = document.querySelector('.table-responsive');
+                    if (table) {
+                        table.outerHTML = `<div id="expensesEmpty" class="alert alert-info"><span>${expenseUrls.emptyMessage}</span> <button class="btn btn-sm btn-primary" data-bs-toggle="modal" data-bs-target="#addExpenseModal">Add Expense</button></div>`;
+                    }
+                }
+                
+                bootstrap.Modal.getInstance(document.getElementById('deleteExpenseModal')).hide();
+                showToast('Expense deleted!', 'success');
+                expensesChanged();
+            }
+        })
+        .catch(e => showToast('Error deleting expense', 'error'));
+    });
+
+    // Set default date
+    document.getElementById('addDate').value = new Date().toISOString().split('T')[0];
+});
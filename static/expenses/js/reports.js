@@ -0,0 +1,55 @@
+// Statements are built in the background: request one, poll its status, then open it.
+const reportConfig = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('reportForm');
+    if (!form) return;
+    const dateInput = form.querySelector('[name="date"]');
+    if (!dateInput.value) dateInput.value = new Date().toISOString().slice(0, 7);
+    
+    function finish(report) {
+        if (report.state === 'done') {
+            window.location.href = report.download_url;
+        } else if (report.state === 'failed') {
+            showToast(report.error || 'The statement could not be built', 'error');
+        } else {
+            // Back off gently while a worker is busy
+            poll.delay = Math.min(poll.delay * 1.5, 5000);
+            setTimeout(() => poll(report.status_url), poll.delay);
+        }
+    }
+    
+    function poll(url) {
+        fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+        .then(r => r.json())
+        .then(data => finish(data.report))
+        .catch(e => showToast('Error checking the statement', 'error'));
+    }
+    poll.delay = 500;
+    
+    form.querySelectorAll('[data-period]').forEach(button => {
+        button.addEventListener('click', function() {
+            const body = new FormData();
+            body.append('period', this.dataset.period);
+            body.append('date', dateInput.value);
+            body.append('format', form.querySelector('[name="format"]').value);
+            poll.delay = 500;
+            
+            fetch(reportConfig.requestUrl, {
+                method: 'POST',
+                headers: {'X-CSRFToken': getCSRFToken(), 'X-Requested-With': 'XMLHttpRequest'},
+                body: body
+            })
+            .then(r => r.json())
+            .then(data => {
+                if (data.status !== 'success') {
+                    showToast(Object.values(data.errors).flat().join(' '), 'error');
+                    return;
+                }
+                if (data.report.state !== 'done') showToast('Preparing your statement...');
+                finish(data.report);
+            })
+            .catch(e => showToast('Error requesting the statement', 'error'));
+        });
+    });
+});
@@ -0,0 +1,32 @@
+function showToast(message, type = 'success') {
+    const toastContainer = document.getElementById('toastContainer');
+    const toastId = 'toast-' + Date.now();
+    const bgColor = type === 'success' ? 'bg-success' : 'bg-danger';
+    const toastHTML = `
+        <div id="${toastId}" class="toast ${bgColor} text-white" role="alert" aria-live="assertive" aria-atomic="true">
+            <div class="toast-body">
+                ${message}
+            </div>
+        </div>
+    `;
+    toastContainer.insertAdjacentHTML('beforeend', toastHTML);
+    const toastEl = document.getElementById(toastId);
+    const toast = new bootstrap.Toast(toastEl);
+    toast.show();
+    
+    // Remove toast element after it's hidden
+    toastEl.addEventListener('hidden.bs.toast', function() {
+        toastEl.remove();
+    });
+}
+
+// Display Django messages as floating toasts on page load
+document.addEventListener('DOMContentLoaded', function() {
+    const messageElements = document.querySelectorAll('[id^="message-"]');
+    messageElements.forEach(function(element) {
+        const message = element.getAttribute('data-message');
+        const tags = element.getAttribute('data-tags');
+        const type = tags.includes('error') || tags.includes('danger') ? 'error' : 'success';
+        showToast(message, type);
+    });
+});